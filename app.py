@@ -1,15 +1,16 @@
 import streamlit as st
-import pandas as pd
 from io import BytesIO
-from bs4 import BeautifulSoup
-import re, json, io, zipfile, requests, os, time, asyncio, tempfile
-from urllib.parse import urlsplit, urlunsplit
+import io, zipfile, os, time, asyncio, tempfile, threading, queue, shutil, weakref
+from urllib.parse import urlsplit
 from pathlib import Path
-from pixelbin import PixelbinClient, PixelbinConfig
-from pixelbin.utils.url import url_to_obj, obj_to_url
-import qrcode
-from PIL import Image
-import io
+from extractors import (
+    extract_bayut_fields, extract_gallery_images_bayut,
+    extract_propertyfinder_fields, extract_gallery_images_propertyfinder,
+)
+from variants import resolve_gallery, resolve_variant
+
+# Heavy dependencies (requests, pixelbin, qrcode, Pillow, imaging) are imported
+# inside the functions that use them so a fresh session only pays for what it runs.
 
 # =========================================================
 # COMMON HELPERS
@@ -28,80 +29,135 @@ def init_event_loop():
         # run a tiny no-op so the loop is usable
         loop.run_until_complete(asyncio.sleep(0.01))
 
-init_event_loop()
-
-def strip_query(u: str) -> str:
-    p = urlsplit(u)
-    return urlunsplit((p.scheme, p.netloc, p.path, "", ""))
+def fetch_image_bytes(url, timeout=20):
+    """Download a remote image and return its raw bytes."""
+    import requests
+    r = requests.get(url, timeout=timeout)
+    r.raise_for_status()
+    return r.content
 
-def find_all_image_urls(raw_html: str):
+class GalleryPrefetcher:
     """
-    Find common image URLs (jpg/jpeg/webp) in HTML text (very permissive).
+    Download gallery originals in background threads into a bounded in-memory buffer.
+    Lives in st.session_state so downloads keep going (and stay warm) across reruns
+    while the user is still pasting the token / picking options.
+    An optional `resolve(url) -> source_url` runs in the worker threads before each
+    download (e.g. picking the best size variant), so it never blocks the UI.
+    Prefetching stops at the first download that does not fit in max_bytes; get()
+    hands bytes over (and frees their space) so they are only held once.
     """
-    pattern = re.compile(r'https?://[^\s"\'<>]+?\.(?:jpg|jpeg|webp)(?:\?[^\s"\'<>]*)?', re.IGNORECASE)
-    urls = pattern.findall(raw_html or "")
-    normalized, seen = [], set()
-    for u in urls:
-        clean = strip_query(u)
-        if clean not in seen:
-            seen.add(clean)
-            normalized.append(clean)
-    return normalized
-
-def _first(*vals):
-    """Return first non-empty string-like value."""
-    for v in vals:
-        if isinstance(v, str) and v.strip():
-            return v.strip()
-    return ""
-
-def _jsonlds(soup: BeautifulSoup):
-    """Parse all application/ld+json blocks and return list of parsed objects."""
-    out = []
-    for s in soup.find_all("script", {"type": "application/ld+json"}):
-        try:
-            if not s.string:
-                continue
-            data = json.loads(s.string)
-            # some pages return a single dict or a list
-            if isinstance(data, list):
-                out.extend(data)
-            else:
-                out.append(data)
-        except Exception:
-            # try to recover some malformed JSON by stripping whitespace/newlines
+
+    def __init__(self, urls, max_workers=4, max_bytes=64 * 1024 * 1024, timeout=20, resolve=None):
+        self.urls = list(urls)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._resolve = resolve
+        self._lock = threading.Lock()
+        self._buffer = {}                                  # url -> bytes (of its source)
+        self._sources = {}                                 # url -> resolved source url
+        self._used = 0
+        self._full = False
+        self._state = {u: "pending" for u in self.urls}    # pending / inflight / done / skipped
+        self._events = {u: threading.Event() for u in self.urls}
+        self._closed = False
+        self._queue = queue.Queue()
+        for u in self.urls:
+            self._queue.put(u)
+        for n in range(min(max_workers, len(self.urls))):
+            threading.Thread(target=self._worker, name=f"gallery-prefetch-{n}", daemon=True).start()
+
+    def _worker(self):
+        while not self._closed:
             try:
-                data = json.loads(s.string.strip())
-                if isinstance(data, list):
-                    out.extend(data)
-                else:
-                    out.append(data)
+                url = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                if self._full:
+                    return  # the rest is left "pending" for the processing step to fetch
+                if self._state.get(url) != "pending":
+                    continue  # already claimed by the processing step
+                self._state[url] = "inflight"
+            src = url
+            if self._resolve is not None:
+                try:
+                    src = self._resolve(url) or url
+                except Exception:
+                    src = url
+                with self._lock:
+                    self._sources[url] = src
+            data = None
+            try:
+                data = fetch_image_bytes(src, timeout=self.timeout)
             except Exception:
-                continue
-    return out
-
-def _get_residence(lds):
-    """Try to pick a residence-like JSON-LD entry (fallback to first dict)."""
-    if not lds:
-        return {}
-    for o in lds:
-        t = o.get("@type") if isinstance(o, dict) else None
-        if t and any(k in str(t).lower() for k in ("residence", "apartment", "house", "product", "offer")):
-            return o
-    # fallback: return first dict-like item
-    for o in lds:
-        if isinstance(o, dict):
-            return o
-    return {}
-
-def upload_to_pixelbin(client, url):
-    """Upload remote URL to PixelBin using a temporary file and return the uploaded URL."""
-    r = requests.get(url, stream=True, timeout=20)
-    r.raise_for_status()
+                pass
+            with self._lock:
+                if data is not None and not self._closed and self._used + len(data) <= self.max_bytes:
+                    self._buffer[url] = data
+                    self._used += len(data)
+                    self._state[url] = "done"
+                else:
+                    # a download that did not fit: every later one would be thrown away too
+                    self._full = self._full or data is not None
+                    self._state[url] = "skipped"
+                self._events[url].set()
+
+    def get(self, url, wait=None):
+        """
+        Return prefetched bytes for url, or None if the caller should download it itself.
+        If the url is currently being downloaded, wait for it (up to `wait` seconds).
+        The bytes are removed from the buffer, so each url can be taken once.
+        """
+        with self._lock:
+            state = self._state.get(url)
+            if state is None:
+                return None
+            if state == "pending":
+                # not started yet: let the caller fetch it and keep the workers off it
+                self._state[url] = "skipped"
+                return None
+            event = self._events[url]
+        event.wait(self.timeout if wait is None else wait)
+        with self._lock:
+            data = self._buffer.pop(url, None)
+            if data is not None:
+                self._used -= len(data)
+            return data
+
+    def source(self, url):
+        """Resolved source url for url (url itself if not resolved yet)."""
+        with self._lock:
+            return self._sources.get(url, url)
+
+    def progress(self):
+        """Return (buffered_count, total_count, buffered_bytes)."""
+        with self._lock:
+            return len(self._buffer), len(self.urls), self._used
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        """Stop background downloads and drop buffered bytes."""
+        with self._lock:
+            self._closed = True
+            self._buffer.clear()
+            self._used = 0
+        for e in self._events.values():
+            e.set()
+
+def upload_to_pixelbin(client, url, content=None):
+    """
+    Upload remote URL to PixelBin using a temporary file and return the uploaded URL.
+    Pass `content` to reuse already downloaded bytes (e.g. from GalleryPrefetcher).
+    """
+    if content is None:
+        content = fetch_image_bytes(url)
     fname = Path(urlsplit(url).path).name or f"image_{int(time.time())}.jpg"
     suffix = "." + fname.split(".")[-1] if "." in fname else ".jpg"
     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(r.content)
+        tmp.write(content)
         tmp_path = tmp.name
     try:
         with open(tmp_path, "rb") as f:
@@ -126,6 +182,7 @@ def upload_to_pixelbin(client, url):
 
 def build_transform_url(asset_url, *, remove_text=True, remove_logo=True, out_format="png"):
     """Create a PixelBin-style transform URL from an asset object."""
+    from pixelbin.utils.url import url_to_obj, obj_to_url
     obj = url_to_obj(asset_url)
     transforms, wm_values = [], []
     if remove_text: wm_values.append({"key": "rem_text", "value": "true"})
@@ -140,6 +197,7 @@ def download_with_poll(url, filename, max_retries=12, wait_seconds=1.0):
     """
     Poll the transform URL until it's ready (non-202) then download and return (filename, BytesIO).
     """
+    import requests
     for attempt in range(max_retries):
         r = requests.get(url, stream=True, timeout=30)
         if r.status_code == 202:
@@ -154,459 +212,386 @@ def download_with_poll(url, filename, max_retries=12, wait_seconds=1.0):
         return filename, file_bytes
     raise RuntimeError("Transformation did not finish in time (kept returning 202).")
 
-# =========================================================
-# BAYUT SCRAPER (from file 2)
-# =========================================================
-
-def extract_bayut_fields(html: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
-    lds  = _jsonlds(soup)
-    res  = _get_residence(lds)
-
-    row = {
-        "Property Name*": "",
-        # "Developer Name": "",
-        "Seller Name*": "",
-        "Property Type*": "",
-        "Description": "",
-        "Location": "",        
-        "Country*": "UAE",
-        "Bathrooms*": "",
-        "Bedrooms*": "",
-        "Google Map URL*": "",
-        "Latitude": "",
-        "Longitude": "",
-        "Property Area*": "",
-        "Plot Area (sq ft)": "",
-        "Total Floors": "",
-        "Instant Buy": "",
-        "Purchase Price*": "",
-        "Down-payment Type": "",
-        "Down-payment Value": "",
-        "Down-payment Price": "",
-        "Service Charge": "",
-        "Handover Date (Quarter)": "",
-        "Handover Date (Year)": "",
-        "Completion Status*": "",
-        "Furnishing Status*": "",
-        "Year Build": "",
-        "Reference Number": "",
-        
-        # Regulatory
-        "Permit Number": "",
-        "Trakheesi Permit Link": "",
-        "BRN": "",
-        "DED": "",
-        "RERA": "",
-        "Zone Name": "",
-        "Registered Agency": "",
-        "ARRA": "",
-
-    }
-
-    # Property Name
-    h1 = soup.find("h1")
-    if h1:
-        row["Property Name*"] = h1.get_text(strip=True)
-
-    # Description
-    desc_el = soup.select_one('[aria-label="Property description"]') \
-        or soup.find("div", {"data-testid": "listing-description"})
-    if desc_el:
-        row["Description"] = desc_el.get_text(" ", strip=True)
-
-    # Location
-    loc_el = soup.find("div", {"aria-label": "Property header"})
-    if loc_el:
-        row["Location"] = loc_el.get_text(" ", strip=True)
-
-    # Country from JSON-LD
-    if res and isinstance(res.get("address"), dict):
-        row["Country*"] = res["address"].get("addressCountry", "UAE")
-
-    # Beds / Baths / Area from JSON-LD (fallbacks)
-    if res:
-        row["Bedrooms*"] = str((res.get("numberOfRooms") or {}).get("value", "")) or row["Bedrooms*"]
-        row["Bathrooms*"] = str(res.get("numberOfBathroomsTotal", "")) or row["Bathrooms*"]
-        row["Property Area*"] = str((res.get("floorSize") or {}).get("value", "")) or row["Property Area*"]
-
-    # ---------- SPECIFIC MAPPING FOR Beds / Baths / Area (FROM THE ELEMENT YOU SHARED) ----------
-    def _grab_feature(label_regex: str) -> str:
-        el = soup.find("span", {"aria-label": re.compile(label_regex, re.I)})
-        if not el:
-            return ""
-        val_el = el.find("span", class_="_3458a9d4") or el
-        return val_el.get_text(" ", strip=True)
-
-    beds  = _grab_feature(r"^Beds$")
-    baths = _grab_feature(r"^Baths$")
-    area  = _grab_feature(r"^Area$")
-
-    if beds:  row["Bedrooms*"]      = beds        
-    if baths: row["Bathrooms*"]     = baths       
-    if area:  row["Property Area*"] = area        
-
-    for spec in soup.find_all("span", {"aria-label": True}):
-        label = spec["aria-label"].strip().lower()
-        inner_val = spec.find("span", class_="_3458a9d4")
-        value = (inner_val.get_text(" ", strip=True)
-                 if inner_val else spec.get_text(" ", strip=True))
-
-        if "reference" in label:
-            row["Reference Number"] = value
-        elif "total floors" in label:
-            row["Total Floors"] = value
-        elif "year of completion" in label:
-            row["Year Build"] = value
-        elif "handover date" in label:
-            val = value.upper()
-            if re.match(r"Q\d\s+\d{4}", val):
-                q, y = val.split()
-                row["Handover Date (Quarter)"] = q
-                row["Handover Date (Year)"] = y
-            elif re.match(r"\d{4}", val):
-                row["Handover Date (Year)"] = val
-
-    # Price
-    for o in lds:
-        if o.get("@type") == "ItemPage" and isinstance(o.get("mainEntity"), dict):
-            offers = o["mainEntity"].get("offers") or []
-            if isinstance(offers, list) and offers:
-                ps = offers[0].get("priceSpecification", {})
-                row["Purchase Price*"] = ps.get("price", "")
-
-    # Property Type
-    m = re.search(r'"property_type"\s*:\s*"([^"]+)"', html, re.I)
-    if m:
-        row["Property Type*"] = m.group(1).rstrip("s").title()
-
-    # Seller Name
-    for o in lds:
-        if o.get("@type") == "ItemPage":
-            me = o.get("mainEntity") or {}
-            off = (me.get("offers") or [{}])[0]
-            offeredBy = off.get("offeredBy") or {}
-            org = offeredBy.get("parentOrganization") or {}
-            row["Seller Name*"] = _first(org.get("name",""), offeredBy.get("name",""))
-
-    # Completion Status
-    m = re.search(r'"completion_status"\s*:\s*"([^"]+)"', html, re.I)
-    if m:
-        row["Completion Status*"] = m.group(1).replace("-", " ").title()
-
-    # Instant Buy rule
-    if row["Completion Status*"].lower() == "under construction":
-        row["Instant Buy"] = ""
-    else:
-        row["Instant Buy"] = "Yes"
-
-    # Furnishing Status
-    furnish_el = soup.find("li", {"aria-label": "Property furnishing status"})
-    if furnish_el:
-        val = furnish_el.get_text(" ", strip=True)
-        if "Furnish" in val:
-            val = val.split()[-1]
-        row["Furnishing Status*"] = val
-
-    # Regulatory info
-    for li in soup.select("ul._7d2126bd li"):
-        label_el = li.find("div", class_="_52bcc5bc")
-        value_el = li.find("span", class_="_677f9d24")
-        if not label_el or not value_el:
-            continue
-
-        label = label_el.get_text(strip=True).lower()
-        value = value_el.get_text(strip=True)
-
-        if "permit number" in label:
-            row["Permit Number"] = value
-        elif "zone name" in label:
-            row["Zone Name"] = value
-        elif "registered agency" in label:
-            row["Registered Agency"] = value
-        elif label == "ded":
-            row["DED"] = value
-        elif label == "rera":
-            row["RERA"] = value
-        elif label == "arra":
-            row["ARRA"] = value
-        elif label == "brn":
-            row["BRN"] = value
-
-    for a in soup.find_all("a", href=True):
-        text = a.get_text(" ", strip=True)
-        if re.search(r"Trakheesi Permit", text, re.I):
-            row["Trakheesi Permit Link"] = a["href"]
-            break
-
-    # Lat/Lon
-    if res and isinstance(res.get("geo"), dict):
-        row["Latitude"] = str(res["geo"].get("latitude",""))
-        row["Longitude"] = str(res["geo"].get("longitude",""))
-
-    if (not row["Latitude"] or not row["Longitude"]) and lds:
-        for obj in lds:
-            if isinstance(obj, dict) and isinstance(obj.get("geo"), dict):
-                row["Latitude"] = str(obj["geo"].get("latitude",""))
-                row["Longitude"] = str(obj["geo"].get("longitude",""))
-                break
-
-    # Google Maps URL
-    if row["Latitude"] and row["Longitude"]:
-        row["Google Map URL*"] = f"https://www.google.com/maps?q={row['Latitude']},{row['Longitude']}"
-
-    return row
-
-def filter_property_images(urls):
-    pattern = re.compile(r"-800x600\.webp$", re.I)
-    kept = []
-    for u in urls:
-        host = urlsplit(u).netloc.lower()
-        if "bayut" not in host:
-            continue
-        if pattern.search(u):
-            kept.append(u)
-    return kept
-
-def extract_gallery_images_bayut(raw_html: str):
-    all_urls = find_all_image_urls(raw_html)
-    return sorted(set(filter_property_images(all_urls)))
+def clean_image(client, url, index, *, remove_text=True, remove_logo=True, out_format="png", content=None):
+    """
+    Run one gallery image through PixelBin: upload, build transform url, poll & download.
+    Returns (uploaded_url, transformed_url, filename, img_bytes).
+    """
+    # 1) upload original (so transforms work on a PixelBin asset)
+    uploaded_url = upload_to_pixelbin(client, url, content=content)
+    if not uploaded_url:
+        raise RuntimeError("Upload to PixelBin failed (no URL returned).")
+
+    # 2) build transform url
+    transformed_url = build_transform_url(
+        uploaded_url,
+        remove_text=remove_text,
+        remove_logo=remove_logo,
+        out_format=out_format
+    )
+
+    # 3) poll & download transformed image
+    fname = f"cleaned_{index}.{out_format}"
+    _, file_bytes = download_with_poll(transformed_url, fname)
+    return uploaded_url, transformed_url, fname, file_bytes.getvalue()
+
+def processing_source(url, prefetcher=None, content=None):
+    """
+    Source url to send to PixelBin for url: the variant the prefetcher resolved, or,
+    when it never got to this image, the variant resolved now, so every image of
+    a gallery goes in at the same size whatever the prefetch timing.
+    """
+    src = prefetcher.source(url) if prefetcher is not None else url
+    if src == url and content is None:
+        src = resolve_variant(url, "processing")
+    return src
 
-# =========================================================
-# PROPERTYFINDER SCRAPER (from file 1)
-# =========================================================
+class ProcessingJob:
+    """
+    Run the PixelBin pipeline for a gallery in a background thread.
+    Full-size results are written to a temp dir; only small thumbnails are kept in
+    memory, so the UI can render pages of results as they arrive and read the
+    full bytes from disk when a download is actually requested.
+    Lives in st.session_state so it keeps running across reruns.
+    """
 
-def extract_propertyfinder_fields(html: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
-
-    row = {
-        "Property Name*": "",
-        "Seller Name*": "",
-        "Developer Name": "",
-        "Property Type*": "",
-        "Description": "",
-        "Location": "",        
-        "Country*": "UAE",
-        "Bathrooms*": "",
-        "Bedrooms*": "",
-        "Google Map URL*": "",
-        "Latitude": "",
-        "Longitude": "",
-        "Property Area*": "",
-        "Plot Area (sq ft)": "",
-        "Total Floors": "",
-        "Instant Buy": "",
-        "Purchase Price*": "",
-        "Down-payment Type": "",
-        "Down-payment Value": "",
-        "Down-payment Price": "",
-        "Service Charge": "",
-        "Handover Date (Quarter)": "",
-        "Handover Date (Year)": "",
-        "Completion Status*": "",
-        "Furnishing Status*": "",
-        "Year Build": "",
-        "Reference Number": "",
-        
-        # Regulatory
-        "Permit Number": "",
-        "Trakheesi Permit": "",
-        "BRN": "",
-        "DED": "",
-        "RERA": "",
-        "Zone Name": "",
-        "Registered Agency": "",
-        "ARRA": "",
-    }
-
-    # ---------------- PROPERTY NAME ----------------
-    desc_div = soup.find("div", id="description")
-    if desc_div:
-        h1 = desc_div.find("h1", class_="styles_desktop_title__j0uNx") or desc_div.find("h1")
-        if h1:
-            row["Property Name*"] = h1.get_text(strip=True)
-
-    # ---------------- SELLER NAME (Agent) ----------------
-    agent_el = soup.select_one('p[data-testid="property-detail-agent-name"]')
-    if agent_el:
-        row["Seller Name*"] = agent_el.get_text(strip=True)
-
-    # ---------------- DESCRIPTION ----------------
-    if desc_div:
-        article = desc_div.select_one('div[data-testid="description-section"] article[data-testid="dynamic-sanitize-html"]')
-        if article:
-            text = article.get_text("\n", strip=True)
-            lines = [line.strip() for line in text.splitlines()]
-            text_clean = "\n".join([ln for ln in lines if ln])
-            row["Description"] = text_clean
-
-    # ---------------- PROPERTY TYPE ----------------
-    type_el = soup.select_one('p[data-testid="property-details-type"]')
-    if type_el:
-        row["Property Type*"] = type_el.get_text(strip=True)
-
-    # ---------------- PROPERTY AREA ----------------
-    area_el = soup.select_one('p[data-testid="property-details-size"]')
-    if area_el:
-        row["Property Area*"] = area_el.get_text(strip=True)
-
-    # ---------------- BEDROOMS ----------------
-    bed_el = soup.select_one('p[data-testid="property-details-bedrooms"]')
-    if bed_el:
-        row["Bedrooms*"] = bed_el.get_text(strip=True)
-
-    # ---------------- BATHROOMS ----------------
-    bath_el = soup.select_one('p[data-testid="property-details-bathrooms"]')
-    if bath_el:
-        row["Bathrooms*"] = bath_el.get_text(strip=True)
-
-    # ---------------- PURCHASE PRICE ----------------
-    price_el = soup.select_one('span[data-testid="property-price-value"]')
-    if price_el:
-        row["Purchase Price*"] = "AED " + price_el.get_text(strip=True)
-
-    # ---------------- JSON-LD (LAT/LON + LOCATION) ----------------
-    script_tag = soup.find("script", {"id": "plp-schema", "type": "application/ld+json"})
-    if script_tag:
+    def __init__(self, client, urls, *, remove_text=True, remove_logo=True, out_format="png",
+                 prefetcher=None, optimize=None):
+        self.urls = list(urls)
+        self.dir = tempfile.mkdtemp(prefix="scrapermapper-")
+        # removes the temp dir when the job is dropped/garbage collected or at interpreter exit
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.dir, True)
+        self.results = []       # dicts: index, filename, path, thumb, size, mime
+        self.meta = []          # same shape as watermark_ui_and_process() output
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.budget_missed = 0  # re-encoded images still over max_bytes
+        self.error = None       # set if the job itself failed (not a single image)
+        self.done = False
+        self.finalized = False  # set once the UI has rendered the finished job
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._client = client
+        self._opts = dict(remove_text=remove_text, remove_logo=remove_logo, out_format=out_format)
+        self._prefetcher = prefetcher
+        self._optimize = optimize   # reencode_named kwargs, or None
+        threading.Thread(target=self._run, name="pixelbin-job", daemon=True).start()
+
+    def _add_result(self, meta, name, data, original_size, budget_met=True):
+        from imaging import make_thumbnail
+        if self._cancel.is_set():
+            return  # cancelled/cleaned up: the temp dir may already be gone
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        try:
+            thumb = make_thumbnail(data)
+        except Exception:
+            thumb = None
+        with self._lock:
+            meta["filename"] = name
+            self.meta.append(meta)
+            self.results.append({
+                "index": meta["index"],
+                "filename": name,
+                "path": path,
+                "thumb": thumb,
+                "size": len(data),
+                "mime": f"image/{name.rsplit('.', 1)[-1]}",
+            })
+            self.results.sort(key=lambda r: r["index"])
+            self.bytes_before += original_size
+            self.bytes_after += len(data)
+            if not budget_met:
+                self.budget_missed += 1
+
+    def _add_reencoded(self, meta, future, data):
+        """
+        Done-callback for a re-encode. If it failed (or the pool broke) the PixelBin
+        bytes are kept and the error is recorded in meta["optimize_error"].
+        """
+        if future.cancelled():
+            return
         try:
-            data = json.loads(script_tag.string)
-            main_entity = data.get("mainEntity", {}).get("mainEntity", {})
-
-            # GEO
-            geo = main_entity.get("geo", {})
-            if geo:
-                row["Latitude"] = str(geo.get("latitude", ""))
-                row["Longitude"] = str(geo.get("longitude", ""))
-                if row["Latitude"] and row["Longitude"]:
-                    row["Google Map URL*"] = f"https://www.google.com/maps?q={row['Latitude']},{row['Longitude']}"
-
-            # LOCATION
-            address = main_entity.get("address", {})
-            if isinstance(address, dict):
-                row["Location"] = address.get("name", "")
+            r = future.result()
         except Exception as e:
-            print("Error parsing JSON-LD:", e)
-
-    # ---------------- REGULATORY INFO ----------------
-    regulatory_div = soup.find("div", class_="styles_desktop_content__Z_YaU")
-    if regulatory_div:
-        # Reference Number
-        ref_el = regulatory_div.select_one('p[data-testid="property-regulatory-reference"]')
-        if ref_el:
-            row["Reference Number"] = ref_el.get_text(strip=True)
-
-        # Collect all regulatory value <p>
-        license_texts = regulatory_div.find_all("p", class_="styles_desktop_value__mxst1")
-        for txt_el in license_texts:
-            txt = txt_el.get_text(strip=True)
-            if ("L.L.C" in txt or "LLC" in txt or "REAL ESTATE" in txt.upper()) and not row["Registered Agency"]:
-                row["Registered Agency"] = txt
-            elif txt.isdigit() and not row["DED"]:
-                row["DED"] = txt
-
-        # Permit Number
-        permit_el = regulatory_div.select_one('p[data-testid="property-regulatory-agent-license-no"]')
-        if permit_el:
-            row["Permit Number"] = permit_el.get_text(strip=True)
-
-        # BRN fallback
-        all_vals = [el.get_text(strip=True) for el in license_texts]
-        if all_vals:
-            for v in reversed(all_vals):
-                if v.isdigit():
-                    row["BRN"] = v
-                    break
-
-        # Zone Name
-        zone_label = regulatory_div.find(lambda tag: tag.name == "p" and "Zone name" in tag.get_text())
-        if zone_label:
-            next_val = zone_label.find_next_sibling("p", class_="styles_desktop_value__mxst1")
-            if next_val:
-                row["Zone Name"] = next_val.get_text(strip=True)
-
-    # ---------------- TRAKHEESI PERMIT (resolve redirect) ----------------
-    qr_div = soup.find("div", {"data-testid": "property-regulatory-qr-code"})
-    if qr_div:
-        link = qr_div.find("a", href=True)
-        if link:
-            raw_url = link["href"]
-            try:
-                response = requests.get(raw_url, allow_redirects=True, timeout=10)
-                row["Trakheesi Permit"] = response.url  
-            except Exception as e:
-                print("Error resolving Trakheesi link:", e)
-                row["Trakheesi Permit"] = raw_url  
-
-    # ---------------- DEVELOPER NAME ----------------
-    if row.get("Registered Agency"):
-        row["Developer Name"] = row.get("Registered Agency")
-    else:
-        broker_name_container = soup.find("div", class_="styles_desktop_broker__name__container__Rnz1J")
-        if broker_name_container:
-            link = broker_name_container.find("a", href=True)
-            if link:
-                href = link["href"]
-                m = re.search(r'/broker/([^/]+)', href)
-                if m:
-                    slug = m.group(1)
-                    slug = re.sub(r'-\d+$', '', slug)
-                    row["Developer Name"] = slug.replace('-', ' ').title()
-
-    return row
-
-def filter_propertyfinder_images(urls):
-    kept = []
-    pattern = re.compile(r"/(\d{2,4})/(\d{2,4})/MODE/", re.I)
-    for u in urls:
-        host = urlsplit(u).netloc.lower()
-        if "propertyfinder.ae" not in host:
-            continue
-        m = pattern.search(u)
-        if not m:
-            continue
+            max_bytes = self._optimize.get("max_bytes")
+            r = {"name": meta["filename"], "data": data, "original_size": len(data),
+                 "budget_met": not max_bytes or len(data) <= max_bytes, "error": f"{type(e).__name__}: {e}"}
+        meta["budget_met"] = r["budget_met"]
+        if r["error"]:
+            meta["optimize_error"] = r["error"]
         try:
-            w, h = int(m.group(1)), int(m.group(2))
-        except Exception:
-            continue
-        if w >= 200 and h >= 200:
-            kept.append(u)
-    return kept
-
-def pick_highest_resolution(urls):
-    key_re = re.compile(r"(.*/\d+)/(\d+)/MODE/([^/]+)/([^/]+)\.(jpg|jpeg|webp)$", re.I)
-    buckets, leftovers = {}, []
-    for u in urls:
-        m = key_re.match(u)
-        if not m:
-            leftovers.append(u)
-            continue
-        key = m.group(4)
+            self._add_result(meta, r["name"], r["data"], r["original_size"], budget_met=r["budget_met"])
+        except Exception as e:
+            with self._lock:
+                meta.update(filename=None, status=f"error: {e}")
+                self.meta.append(meta)
+
+    def _run(self):
+        from concurrent.futures import wait
+        from imaging import process_pool, reencode_named
+        pool = None
+        pending = []
         try:
-            w = int(m.group(2))
-            h = int(m.group(3)) if m.group(3).isdigit() else 0
-        except Exception:
-            w, h = 0, 0
-        area = w * h
-        best = buckets.get(key)
-        if not best or area > best[0]:
-            buckets[key] = (area, u)
-    best_urls = [t[1] for t in buckets.values()]
-    return sorted(set(best_urls + leftovers))
-
-def extract_gallery_images_propertyfinder(raw_html: str):
-    return pick_highest_resolution(filter_propertyfinder_images(find_all_image_urls(raw_html)))
+            init_event_loop()  # the PixelBin SDK needs a loop in this thread too
+            pool = process_pool() if self._optimize else None
+            for i, url in enumerate(self.urls, start=1):
+                if self._cancel.is_set():
+                    break
+                try:
+                    content = self._prefetcher.get(url) if self._prefetcher else None
+                    src = processing_source(url, self._prefetcher, content)
+                    uploaded_url, transformed_url, fname, img_bytes = clean_image(
+                        self._client, src, i, content=content, **self._opts
+                    )
+                except Exception as e:
+                    with self._lock:
+                        self.meta.append({
+                            "index": i,
+                            "original_url": url,
+                            "uploaded_url": None,
+                            "transformed_url": None,
+                            "filename": None,
+                            "status": f"error: {e}"
+                        })
+                    continue
+                meta = {
+                    "index": i,
+                    "original_url": url,
+                    "uploaded_url": uploaded_url,
+                    "transformed_url": transformed_url,
+                    "filename": fname,
+                    "status": "ok"
+                }
+                if pool is None:
+                    self._add_result(meta, fname, img_bytes, len(img_bytes))
+                    continue
+                # re-encode in the process pool while the next image goes through PixelBin
+                fut = pool.submit(reencode_named, fname, img_bytes, **self._optimize)
+                fut.add_done_callback(lambda f, meta=meta, data=img_bytes: self._add_reencoded(meta, f, data))
+                pending.append(fut)
+            if not self._cancel.is_set():
+                wait(pending)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=self._cancel.is_set())
+            if self._prefetcher is not None:
+                self._prefetcher.close()  # consumed; the UI drops it on the next rerun
+            self.done = True
+
+    def snapshot(self):
+        """Return (results, meta) copies that are safe to iterate in the UI."""
+        with self._lock:
+            return list(self.results), sorted(self.meta, key=lambda m: m["index"])
+
+    def build_zip(self):
+        """Write all finished results into a ZIP on disk and return its path."""
+        results, _ = self.snapshot()
+        zip_path = os.path.join(self.dir, "processed_images.zip")
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            for r in results:
+                zf.write(r["path"], arcname=r["filename"])
+        return zip_path
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cleanup(self):
+        """Cancel the job and remove its temp dir now instead of waiting for the finalizer."""
+        self.cancel()
+        self._finalizer()
 
 # =========================================================
 # STREAMLIT APP (updated watermark processing)
 # =========================================================
 
-st.title("ScraperMapper")
+def render_trakheesi_qr(trakheesi_url):
+    """Show a Trakheesi permit QR code (with logo when available) and a download button."""
+    import qrcode
+    from PIL import Image
+
+    st.subheader("Trakheesi QR Code")
+    try:
+        logo_img = Image.open("trakheesi-logo.png")
+    except FileNotFoundError:
+        st.warning("Logo file 'trakheesi-logo.png' not found. Showing QR without logo.")
+        logo_img = None
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_H,
+        box_size=10,
+        border=1,
+    )
+    qr.add_data(trakheesi_url)
+    qr.make(fit=True)
+
+    qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+
+    if logo_img:
+        qr_width, qr_height = qr_img.size
+        logo_size = min(qr_width, qr_height) // 5
+        logo_img = logo_img.resize((logo_size, logo_size))
+        logo_position = ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2)
+        qr_img.paste(logo_img, logo_position, logo_img.convert("RGBA"))
+
+    img_bytes = io.BytesIO()
+    qr_img.save(img_bytes, format="PNG")
+    img_bytes.seek(0)
+
+    st.image(img_bytes, caption="Trakheesi QR Code", width=300)
+    st.download_button(
+        label="⬇️ Download Trakheesi QR Code",
+        data=img_bytes,
+        file_name="Trakheesi-QR_Code.png",
+        mime="image/png",
+    )
+
+def get_gallery_prefetcher(gallery):
+    """
+    Start (or reuse) a background prefetcher for this gallery, kept across reruns.
+    Each image is swapped for the best size PixelBin accepts (verified variants are
+    cached on disk) in the background. A new or empty gallery closes the old
+    prefetcher, and one that processing has consumed (closed) is dropped and not
+    restarted for the same gallery. Returns None when there is nothing to prefetch.
+    """
+    gallery = list(gallery)
+    prefetcher = st.session_state.get("gallery_prefetcher")
+    if prefetcher is not None and (prefetcher.closed or prefetcher.urls != gallery):
+        prefetcher.close()
+        del st.session_state["gallery_prefetcher"]
+        prefetcher = None
+    if not gallery:
+        st.session_state.pop("prefetched_gallery", None)
+    elif prefetcher is None and st.session_state.get("prefetched_gallery") != gallery:
+        prefetcher = GalleryPrefetcher(gallery, resolve=lambda u: resolve_variant(u, "processing"))
+        st.session_state.gallery_prefetcher = prefetcher
+        st.session_state.prefetched_gallery = gallery
+    return prefetcher
+
+def render_gallery_preview(urls, width=120):
+    """
+    Show thumbnail-size variants of urls. The HEAD probes run in a background thread
+    (kept in st.session_state), the scraped urls are shown until they finish, and a
+    fragment swaps the thumbnails in without blocking the script on a slow CDN.
+    """
+    urls = list(urls)
+    state = st.session_state.get("gallery_preview")
+    if state is None or state["urls"] != urls:
+        state = {"urls": urls, "resolved": None}
+
+        def _resolve():
+            try:
+                state["resolved"] = resolve_gallery(urls, "thumbnail")
+            except Exception:
+                state["resolved"] = urls
+
+        threading.Thread(target=_resolve, name="thumbnail-resolve", daemon=True).start()
+        st.session_state.gallery_preview = state
 
-platform = st.sidebar.radio("Choose Platform", ["Bayut", "PropertyFinder"])
+    def _preview():
+        st.image(state["resolved"] or urls, width=width)
 
-def watermark_ui_and_process(gallery):
+    fragment = getattr(st, "fragment", None)
+    if fragment is None or state["resolved"] is not None:
+        _preview()
+    else:
+        @fragment(run_every=1.0)
+        def _poll():
+            _preview()
+            if state["resolved"] is not None:
+                st.rerun()  # full rerun so the fragment stops polling
+        _poll()
+
+def render_processing_job(job, page_size_options=(12, 24, 48), columns=4):
+    """
+    Paginated thumbnail grid for a ProcessingJob. Runs as a fragment that refreshes
+    itself while the job is running, so new results appear without rerunning the
+    whole script. Full-size bytes are only sent when a download is requested.
+    """
+    fragment = getattr(st, "fragment", None)
+    polling = fragment is not None and not job.done
+
+    def _grid():
+        results, meta = job.snapshot()
+        total = len(job.urls)
+        finished = len(meta)
+        st.progress(finished / total if total else 1.0,
+                    text=f"Processed {finished}/{total}" + ("" if job.done else " …"))
+
+        if job.error:
+            st.error(f"❌ Processing stopped: {job.error}")
+        for m in meta:
+            if m["status"] != "ok":
+                st.error(f"❌ Failed to process image {m['original_url']}: {m['status'][len('error: '):]}")
+            elif m.get("optimize_error"):
+                st.warning(f"Could not optimize {m['filename']}: {m['optimize_error']}")
+
+        if job.done and job.bytes_before > job.bytes_after:
+            from imaging import format_bytes
+            st.success(f"Optimized {format_bytes(job.bytes_before)} → {format_bytes(job.bytes_after)} "
+                       f"(saved {format_bytes(job.bytes_before - job.bytes_after)})")
+        if job.budget_missed:
+            st.warning(f"{job.budget_missed} image(s) are over the size budget even at minimum quality and size.")
+
+        if results:
+            colP1, colP2 = st.columns([1, 1])
+            with colP1:
+                page_size = st.selectbox("Images per page", page_size_options, key="grid_page_size")
+            pages = max(1, -(-len(results) // page_size))
+            with colP2:
+                page = st.number_input("Page", 1, pages, 1, key="grid_page") if pages > 1 else 1
+            start = (page - 1) * page_size
+            page_results = results[start:start + page_size]
+
+            cols = st.columns(columns)
+            for n, r in enumerate(page_results):
+                with cols[n % columns]:
+                    if r["thumb"]:
+                        st.image(r["thumb"], caption=r["filename"], width="stretch")
+                    else:
+                        st.caption(r["filename"])
+                    key = f"{r['index']}_{r['filename']}"
+                    if st.session_state.get("dl_selected") == key:
+                        with open(r["path"], "rb") as f:
+                            st.download_button("⬇️ Save", data=f.read(), file_name=r["filename"],
+                                               mime=r["mime"], key=f"dl_{key}")
+                    else:
+                        st.button("⬇️ Full size", key=f"prep_{key}",
+                                  on_click=st.session_state.update, kwargs={"dl_selected": key})
+
+        if job.done and results:
+            zip_path = st.session_state.get("zip_path")
+            if zip_path and os.path.exists(zip_path):
+                with open(zip_path, "rb") as f:
+                    st.download_button(
+                        label="📥 Download All Images (ZIP)",
+                        data=f.read(),
+                        file_name="processed_images.zip",
+                        mime="application/zip"
+                    )
+            else:
+                st.button("📦 Prepare ZIP of all images",
+                          on_click=lambda: st.session_state.update(zip_path=job.build_zip()))
+
+        # one full rerun when the job finishes, so the fragment stops polling
+        if polling and job.done and not job.finalized:
+            job.finalized = True
+            st.rerun()
+
+    if fragment is None:
+        # older Streamlit: render whatever is ready; reruns pick up new results
+        _grid()
+    else:
+        fragment(run_every=None if job.done else 1.0)(_grid)()
+
+def watermark_ui_and_process(gallery, prefetcher=None):
     """
     UI for PixelBin settings and processing. Returns list of processed metadata dicts.
+    If a GalleryPrefetcher is given, originals are taken from its buffer when available.
     """
     st.markdown("### PixelBin Watermark Remover:")
     api_token = st.text_input("PixelBin API Token (paste here)", type="password")
@@ -618,6 +603,22 @@ def watermark_ui_and_process(gallery):
     with col3:
         out_format = st.selectbox("Output format", ["png", "jpg", "webp"], index=0, key="out_fmt")
 
+    # Local re-encoding of the cleaned images (PixelBin output is large)
+    optimize = st.checkbox("Optimize cleaned images locally (smaller files)", value=False, key="opt_enabled")
+    if optimize:
+        colO1, colO2, colO3, colO4 = st.columns([1,1,1,1])
+        with colO1:
+            opt_format = st.selectbox("Optimized format", ["webp", "jpg"], index=0, key="opt_fmt")
+        with colO2:
+            opt_quality = st.slider("Quality", 30, 95, 80, key="opt_quality")
+        with colO3:
+            opt_max_dim = st.number_input("Max dimension (px)", 320, 6000, 1600, step=80, key="opt_max_dim")
+        with colO4:
+            opt_max_kb = st.number_input("Max size per image (KB, 0 = no limit)", 0, 20000, 0, step=50, key="opt_max_kb")
+
+    # Paginated thumbnails + background job (keeps the session light for big galleries)
+    paginated = st.checkbox("Paginated thumbnail view (recommended for large galleries)", value=True, key="paginated_view")
+
     # Initialize stop flag in session state
     if "stop_processing" not in st.session_state:
         st.session_state.stop_processing = False
@@ -629,8 +630,17 @@ def watermark_ui_and_process(gallery):
     with colB:
         stop_clicked = st.button("⏹ Cancel Processing")
 
+    job = st.session_state.get("processing_job")
+    if job is not None and job.urls != list(gallery):
+        # another listing was loaded: stop spending PixelBin calls on the old gallery
+        job.cleanup()
+        job = None
+        for key in ("processing_job", "dl_selected", "zip_path", "grid_page"):
+            st.session_state.pop(key, None)
     if stop_clicked:
         st.session_state.stop_processing = True
+        if job is not None:
+            job.cancel()
 
     processed_meta = []
 
@@ -642,7 +652,9 @@ def watermark_ui_and_process(gallery):
         # Reset stop flag before starting
         st.session_state.stop_processing = False
 
-        # init pixelbin client
+        # init pixelbin client (the SDK needs an event loop in the script thread)
+        from pixelbin import PixelbinClient, PixelbinConfig
+        init_event_loop()
         config = PixelbinConfig({
             "domain": "https://api.pixelbin.io",
             "apiSecret": api_token
@@ -653,191 +665,230 @@ def watermark_ui_and_process(gallery):
             st.warning("No gallery images to process.")
             return []
 
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, "w") as zf:
-            for i, url in enumerate(gallery, start=1):
-                if st.session_state.stop_processing:
-                    st.warning("⏹ Processing stopped by user.")
-                    break
+        optimize_opts = None
+        if optimize:
+            optimize_opts = {
+                "fmt": opt_format,
+                "quality": int(opt_quality),
+                "max_dim": int(opt_max_dim),
+                "max_bytes": int(opt_max_kb) * 1024 or None,
+            }
+
+        if paginated:
+            if job is not None:
+                job.cleanup()
+            job = ProcessingJob(
+                client, gallery,
+                remove_text=remove_text,
+                remove_logo=remove_logo,
+                out_format=out_format,
+                prefetcher=prefetcher,
+                optimize=optimize_opts,
+            )
+            st.session_state.processing_job = job
+            st.session_state.pop("dl_selected", None)
+            st.session_state.pop("zip_path", None)
+            st.session_state.pop("grid_page", None)
+        else:
+            processed_meta = _process_inline(client, gallery, prefetcher, out_format, optimize_opts,
+                                             remove_text=remove_text, remove_logo=remove_logo)
+
+    if paginated and job is not None:
+        render_processing_job(job)
+        processed_meta = job.snapshot()[1]
 
-                with st.spinner(f"Processing {i}/{len(gallery)}..."):
-                    try:
-                        # 1) upload original (so transforms work on a PixelBin asset)
-                        uploaded_url = upload_to_pixelbin(client, url)
-                        if not uploaded_url:
-                            raise RuntimeError("Upload to PixelBin failed (no URL returned).")
-
-                        # 2) build transform url
-                        transformed_url = build_transform_url(
-                            uploaded_url,
-                            remove_text=remove_text,
-                            remove_logo=remove_logo,
-                            out_format=out_format
-                        )
-
-                        # 3) poll & download transformed image
-                        fname = f"cleaned_{i}.{out_format}"
-                        _, file_bytes = download_with_poll(transformed_url, fname)
-                        img_bytes = file_bytes.getvalue()
-
-                        # 4) show image + download button
-                        st.image(img_bytes, caption=fname, width="stretch")
-                        st.download_button(
-                            label=f"⬇️ Download {fname}",
-                            data=io.BytesIO(img_bytes).getvalue(),
-                            file_name=fname,
-                            mime=f"image/{out_format}"
-                        )
-
-                        # 5) add to zip
-                        zf.writestr(fname, img_bytes)
+    return processed_meta
 
-                        processed_meta.append({
-                            "index": i,
-                            "original_url": url,
-                            "uploaded_url": uploaded_url,
-                            "transformed_url": transformed_url,
-                            "filename": fname,
-                            "status": "ok"
-                        })
-                    except Exception as e:
-                        st.error(f"❌ Failed to process image {url}: {e}")
-                        processed_meta.append({
-                            "index": i,
-                            "original_url": url,
-                            "uploaded_url": None,
-                            "transformed_url": None,
-                            "filename": None,
-                            "status": f"error: {e}"
-                        })
+def _process_inline(client, gallery, prefetcher, out_format, optimize_opts, *, remove_text, remove_logo):
+    """
+    Classic rendering: process images in the script thread and show each one full size
+    with its own download button, then a ZIP button. Returns processed metadata dicts.
+    When optimizing, images are re-encoded in a process pool and shown in order as
+    soon as they are ready, while the next image goes through PixelBin.
+    """
+    from collections import deque
+    processed_meta = []
+    optimize = optimize_opts is not None
+    pool = None
+    if optimize:
+        from imaging import process_pool, reencode_named, format_bytes
+        pool = process_pool()
+    pending = deque()         # (meta, future) in gallery order
+    totals = {"before": 0, "after": 0}
+
+    def _show_result(fname, img_bytes, fmt):
+        st.image(img_bytes, caption=fname, width="stretch")
+        st.download_button(
+            label=f"⬇️ Download {fname}",
+            data=io.BytesIO(img_bytes).getvalue(),
+            file_name=fname,
+            mime=f"image/{fmt}"
+        )
+
+    def _drain(zf, block=False):
+        """Show + zip re-encoded images that are ready (all of them if block)."""
+        while pending and (block or pending[0][1].done()):
+            meta, fut, data = pending.popleft()
+            try:
+                r = fut.result()
+            except Exception as e:  # broken pool: keep the PixelBin bytes
+                r = {"name": meta["filename"], "data": data, "original_size": len(data), "size": len(data),
+                     "budget_met": not optimize_opts["max_bytes"] or len(data) <= optimize_opts["max_bytes"],
+                     "error": f"{type(e).__name__}: {e}"}
+            if r["error"]:
+                meta["optimize_error"] = r["error"]
+                st.warning(f"Could not optimize {r['name']}: {r['error']}")
+            elif not r["budget_met"]:
+                st.warning(f"{r['name']} is {format_bytes(r['size'])}, over the size budget even at minimum quality and size.")
+            _show_result(r["name"], r["data"], r["name"].rsplit(".", 1)[-1])
+            zf.writestr(r["name"], r["data"])
+            meta["filename"] = r["name"]
+            meta["budget_met"] = r["budget_met"]
+            totals["before"] += r["original_size"]
+            totals["after"] += r["size"]
+
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        for i, url in enumerate(gallery, start=1):
+            if st.session_state.stop_processing:
+                st.warning("⏹ Processing stopped by user.")
+                break
 
-        # make ZIP available if at least one OK file added
-        if any(p.get("status") == "ok" for p in processed_meta):
-            zip_buffer.seek(0)
-            st.download_button(
-                label="📥 Download All Images (ZIP)",
-                data=zip_buffer.getvalue(),
-                file_name="processed_images.zip",
-                mime="application/zip"
-            )
+            with st.spinner(f"Processing {i}/{len(gallery)}..."):
+                try:
+                    # 1-3) upload, transform, poll & download
+                    content = prefetcher.get(url) if prefetcher else None
+                    src = processing_source(url, prefetcher, content)
+                    uploaded_url, transformed_url, fname, img_bytes = clean_image(
+                        client, src, i,
+                        remove_text=remove_text,
+                        remove_logo=remove_logo,
+                        out_format=out_format,
+                        content=content
+                    )
+
+                    meta = {
+                        "index": i,
+                        "original_url": url,
+                        "uploaded_url": uploaded_url,
+                        "transformed_url": transformed_url,
+                        "filename": fname,
+                        "status": "ok"
+                    }
+                    processed_meta.append(meta)
+
+                    # 4) show image + download button and add to zip
+                    #    (after re-encoding in the pool when optimizing)
+                    if optimize:
+                        pending.append((meta, pool.submit(reencode_named, fname, img_bytes, **optimize_opts), img_bytes))
+                    else:
+                        _show_result(fname, img_bytes, out_format)
+                        zf.writestr(fname, img_bytes)
+                except Exception as e:
+                    st.error(f"❌ Failed to process image {url}: {e}")
+                    processed_meta.append({
+                        "index": i,
+                        "original_url": url,
+                        "uploaded_url": None,
+                        "transformed_url": None,
+                        "filename": None,
+                        "status": f"error: {e}"
+                    })
+
+            _drain(zf)
+
+        # 5) show the remaining re-encoded images
+        if pool is not None:
+            with st.spinner(f"Optimizing {len(pending)} remaining images..."):
+                _drain(zf, block=True)
+            pool.shutdown()
+            saved = totals["before"] - totals["after"]
+            if totals["before"]:
+                st.success(f"Optimized {format_bytes(totals['before'])} → {format_bytes(totals['after'])} "
+                           f"(saved {format_bytes(saved)})")
+
+    if prefetcher is not None:
+        prefetcher.close()  # consumed; dropped on the next rerun
+
+    # make ZIP available if at least one OK file added
+    if any(p.get("status") == "ok" for p in processed_meta):
+        zip_buffer.seek(0)
+        st.download_button(
+            label="📥 Download All Images (ZIP)",
+            data=zip_buffer.getvalue(),
+            file_name="processed_images.zip",
+            mime="application/zip"
+        )
 
     return processed_meta
 
 
-if platform == "Bayut":
-    uploaded_file = st.file_uploader("Upload saved Bayut .txt file", type=["txt","html"])
-    if uploaded_file:
-        html = uploaded_file.read().decode("utf-8", errors="ignore")
+def main():
+    st.title("ScraperMapper")
 
-        # --- Text fields ---
-        fields = extract_bayut_fields(html)
-        st.subheader("Extracted Property Fields:")
-        st.json(fields)
+    platform = st.sidebar.radio("Choose Platform", ["Bayut", "PropertyFinder"])
+    gallery = []
 
-        # ✅ Trakheesi QR Code if link exists
-        trakheesi_url = fields.get("Trakheesi Permit Link")
-        if trakheesi_url:
-            st.subheader("Trakheesi QR Code")
-            try:
-                logo_img = Image.open("trakheesi-logo.png")
-            except FileNotFoundError:
-                st.warning("Logo file 'trakheesi-logo.png' not found. Showing QR without logo.")
-                logo_img = None
-
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_H,
-                box_size=10,
-                border=1,
-            )
-            qr.add_data(trakheesi_url)
-            qr.make(fit=True)
-
-            qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-
-            if logo_img:
-                qr_width, qr_height = qr_img.size
-                logo_size = min(qr_width, qr_height) // 5
-                logo_img = logo_img.resize((logo_size, logo_size))
-                logo_position = ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2)
-                qr_img.paste(logo_img, logo_position, logo_img.convert("RGBA"))
-
-            img_bytes = io.BytesIO()
-            qr_img.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
-
-            st.image(img_bytes, caption="Trakheesi QR Code", width=300)
-            st.download_button(
-                label="⬇️ Download Trakheesi QR Code",
-                data=img_bytes,
-                file_name="Trakheesi-QR_Code.png",
-                mime="image/png",
-            )
+    if platform == "Bayut":
+        uploaded_file = st.file_uploader("Upload saved Bayut .txt file", type=["txt","html"])
+        if uploaded_file:
+            html = uploaded_file.read().decode("utf-8", errors="ignore")
 
-        # Gallery extraction (unchanged)
-        gallery = extract_gallery_images_bayut(html)
-        st.subheader(f"Gallery images found: {len(gallery)}")
-        if gallery:
-            st.image(gallery[:5], width=120)
+            # --- Text fields ---
+            fields = extract_bayut_fields(html)
+            st.subheader("Extracted Property Fields:")
+            st.json(fields)
 
-        # ---------- Watermark processing ----------
-        watermark_meta = watermark_ui_and_process(gallery)
+            # ✅ Trakheesi QR Code if link exists
+            trakheesi_url = fields.get("Trakheesi Permit Link")
+            if trakheesi_url:
+                render_trakheesi_qr(trakheesi_url)
 
+            # Gallery extraction (unchanged)
+            gallery = extract_gallery_images_bayut(html)
+            st.subheader(f"Gallery images found: {len(gallery)}")
+            # Start resolving + downloading originals while the user configures processing
+            prefetcher = get_gallery_prefetcher(gallery)
 
-elif platform == "PropertyFinder":
-    uploaded = st.file_uploader("Upload PropertyFinder HTML (.txt / .html)", type=["txt","html"])
-    if uploaded:
-        html = uploaded.read().decode("utf-8", errors="ignore")
+            if gallery:
+                render_gallery_preview(gallery[:5])
 
-        fields = extract_propertyfinder_fields(html)
-        st.subheader("📑 Extracted Property Fields")
-        st.json(fields)
+            # ---------- Watermark processing ----------
+            watermark_meta = watermark_ui_and_process(gallery, prefetcher=prefetcher)
 
-        # ✅ Generate QR Code if Trakheesi Permit link exists
-        trakheesi_url = fields.get("Trakheesi Permit")
-        if trakheesi_url:
-            st.subheader("Trakheesi QR Code")
-            try:
-                logo_img = Image.open("trakheesi-logo.png")
-            except FileNotFoundError:
-                st.warning("Logo file 'trakheesi-logo.png' not found. Showing QR without logo.")
-                logo_img = None
-
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_H,
-                box_size=10,
-                border=1,
-            )
-            qr.add_data(trakheesi_url)
-            qr.make(fit=True)
-
-            qr_img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-
-            if logo_img:
-                qr_width, qr_height = qr_img.size
-                logo_size = min(qr_width, qr_height) // 5
-                logo_img = logo_img.resize((logo_size, logo_size))
-                logo_position = ((qr_width - logo_size) // 2, (qr_height - logo_size) // 2)
-                qr_img.paste(logo_img, logo_position, logo_img.convert("RGBA"))
-
-            img_bytes = io.BytesIO()
-            qr_img.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
-
-            st.image(img_bytes, caption="Trakheesi QR Code", width=300)
-            st.download_button(
-                label="⬇️ Download Trakheesi QR Code",
-                data=img_bytes,
-                file_name="Trakheesi-QR_Code.png",
-                mime="image/png",
-            )
 
-        # Gallery extraction (unchanged)
-        gallery = extract_gallery_images_propertyfinder(html)
-        st.subheader(f"Gallery images found: {len(gallery)}")
-        if gallery:
-            st.image(gallery[:5], width=120)
+    elif platform == "PropertyFinder":
+        uploaded = st.file_uploader("Upload PropertyFinder HTML (.txt / .html)", type=["txt","html"])
+        if uploaded:
+            html = uploaded.read().decode("utf-8", errors="ignore")
+
+            fields = extract_propertyfinder_fields(html)
+            st.subheader("📑 Extracted Property Fields")
+            st.json(fields)
+
+            # ✅ Generate QR Code if Trakheesi Permit link exists
+            trakheesi_url = fields.get("Trakheesi Permit")
+            if trakheesi_url:
+                render_trakheesi_qr(trakheesi_url)
+
+            # Gallery extraction (unchanged)
+            gallery = extract_gallery_images_propertyfinder(html)
+            st.subheader(f"Gallery images found: {len(gallery)}")
+            # Start resolving + downloading originals while the user configures processing
+            prefetcher = get_gallery_prefetcher(gallery)
+
+            if gallery:
+                render_gallery_preview(gallery[:5])
+
+            # ---------- Watermark processing ----------
+            watermark_meta = watermark_ui_and_process(gallery, prefetcher=prefetcher)
+
+    if not gallery:
+        # no listing loaded (or the platform was switched): release the old downloads
+        get_gallery_prefetcher(gallery)
+
 
-        # ---------- Watermark processing ----------
-        watermark_meta = watermark_ui_and_process(gallery)
+# Worker processes started with "spawn" (see imaging.process_pool) re-run the main
+# script as "__mp_main__" -- under Streamlit that is this file -- and must not render the UI.
+if __name__ != "__mp_main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Sharded batch runner for large backlogs of saved listing files.
+
+Work items live in a SQLite queue on a shared filesystem. Each item belongs to a
+shard; a worker drains its own shard first and then steals from the others.
+Claims are leases: an item whose worker died is reclaimed once the lease expires.
+Every worker appends results to its own JSONL file, and `merge` combines them.
+
+    python batch_runner.py init  queue.db manifest.txt --shards 4
+    python batch_runner.py run   queue.db results/ --workers 4      # local processes
+    python batch_runner.py worker queue.db results/ --shard 2        # one worker (any machine)
+    python batch_runner.py status queue.db
+    python batch_runner.py merge results/ merged.jsonl
+
+The manifest has one saved HTML/TXT path per line, optionally prefixed with
+"bayut<TAB>" or "propertyfinder<TAB>". Without a prefix the platform is guessed
+from the page. Relative paths are resolved against the manifest's directory and
+stored as absolute paths, so every worker machine must see the files (and the
+queue) at the same mount path. Note: SQLite locking needs a filesystem with working
+POSIX locks (local disk or a properly configured NFS/SMB share).
+"""
+
+import argparse, json, os, socket, sqlite3, subprocess, sys, time
+from pathlib import Path
+
+from extractors import (
+    extract_bayut_fields, extract_gallery_images_bayut,
+    extract_propertyfinder_fields, extract_gallery_images_propertyfinder,
+)
+
+PLATFORMS = {
+    "bayut": (extract_bayut_fields, extract_gallery_images_bayut),
+    "propertyfinder": (extract_propertyfinder_fields, extract_gallery_images_propertyfinder),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT NOT NULL UNIQUE,
+    platform    TEXT,
+    shard       INTEGER NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'pending',   -- pending / leased / done / failed
+    worker      TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS items_claim ON items (status, shard);
+"""
+
+# =========================================================
+# QUEUE
+# =========================================================
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 60000")
+    return conn
+
+def init_queue(db_path, manifest_path, shards=1):
+    """
+    Create the queue (if needed) and add manifest entries round-robin across shards.
+    Relative manifest paths are taken relative to the manifest file.
+    """
+    if shards < 1:
+        raise ValueError(f"shards must be at least 1, got {shards}")
+    base = Path(manifest_path).resolve().parent
+    entries = []
+    for line in Path(manifest_path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        platform, _, path = line.rpartition("\t")
+        platform = platform.strip().lower() or None
+        if platform and platform not in PLATFORMS:
+            raise ValueError(f"Unknown platform {platform!r} in manifest line: {line}")
+        entries.append((path, platform))
+
+    conn = connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute("BEGIN IMMEDIATE")
+        added = 0
+        for i, (path, platform) in enumerate(entries):
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO items (path, platform, shard) VALUES (?, ?, ?)",
+                (str((base / path).resolve()), platform, i % shards),
+            )
+            added += cur.rowcount
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    return added
+
+def claim(conn, worker, shard=None, lease_seconds=300, max_attempts=3):
+    """
+    Atomically lease one item: pending items or expired leases, own shard first.
+    Returns (id, path, platform) or None when nothing is left to claim.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # expired leases that used up their attempts will never be claimed again
+        conn.execute(
+            """
+            UPDATE items SET status = 'failed', error = COALESCE(error, 'lease expired')
+            WHERE status = 'leased' AND lease_until < ? AND attempts >= ?
+            """,
+            (now, max_attempts),
+        )
+        row = conn.execute(
+            """
+            SELECT id, path, platform FROM items
+            WHERE (status = 'pending' OR (status = 'leased' AND lease_until < ?))
+              AND attempts < ?
+            ORDER BY (shard != ?), id
+            LIMIT 1
+            """,
+            (now, max_attempts, -1 if shard is None else shard),
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE items SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker, now + lease_seconds, row[0]),
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+def finish(conn, item_id, worker, error=None, max_attempts=3):
+    """
+    Mark a leased item done, or failed / back to pending on error.
+    Ignored if the lease has since been taken over by another worker.
+    """
+    if error is None:
+        conn.execute(
+            "UPDATE items SET status = 'done', error = NULL WHERE id = ? AND worker = ?",
+            (item_id, worker),
+        )
+    else:
+        conn.execute(
+            """
+            UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                             error = ?, lease_until = NULL
+            WHERE id = ? AND worker = ?
+            """,
+            (max_attempts, error, item_id, worker),
+        )
+
+def _has_open_leases(conn):
+    """
+    Any item still leased, including leases on their final attempt: those must be
+    waited out so claim() can mark them failed once the lease expires.
+    """
+    return conn.execute("SELECT 1 FROM items WHERE status = 'leased' LIMIT 1").fetchone() is not None
+
+def queue_status(db_path):
+    """Return {status: count}."""
+    conn = connect(db_path)
+    try:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+    finally:
+        conn.close()
+
+# =========================================================
+# WORKER
+# =========================================================
+
+def guess_platform(html):
+    return "propertyfinder" if "propertyfinder.ae" in html.lower() else "bayut"
+
+def process_file(path, platform=None):
+    """Run the extractor for one saved listing file and return a result record."""
+    html = Path(path).read_text(encoding="utf-8", errors="ignore")
+    platform = platform or guess_platform(html)
+    extract_fields, extract_gallery = PLATFORMS[platform]
+    return {
+        "path": path,
+        "platform": platform,
+        "fields": extract_fields(html),
+        "gallery": extract_gallery(html),
+    }
+
+def run_worker(db_path, out_dir, shard=None, lease_seconds=300, max_attempts=3, worker=None):
+    """Claim and process items until the queue is drained. Returns number of items done."""
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"results-{worker}.jsonl"
+
+    conn = connect(db_path)
+    done = 0
+    try:
+        with open(out_path, "a", encoding="utf-8") as out:
+            while True:
+                item = claim(conn, worker, shard=shard, lease_seconds=lease_seconds, max_attempts=max_attempts)
+                if item is None:
+                    # others still hold leases: wait in case one expires and needs reclaiming
+                    if not _has_open_leases(conn):
+                        break
+                    time.sleep(min(5.0, lease_seconds))
+                    continue
+                item_id, path, platform = item
+                try:
+                    record = process_file(path, platform)
+                except Exception as e:
+                    finish(conn, item_id, worker, error=f"{type(e).__name__}: {e}", max_attempts=max_attempts)
+                    continue
+                record["worker"] = worker
+                record["finished_at"] = time.time()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                finish(conn, item_id, worker)
+                done += 1
+    finally:
+        conn.close()
+    return done
+
+def run_local(db_path, out_dir, workers=2, shards=None, lease_seconds=300, max_attempts=3):
+    """Start `workers` worker processes on this machine and wait for them."""
+    procs = []
+    for n in range(workers):
+        cmd = [sys.executable, os.path.abspath(__file__), "worker", str(db_path), str(out_dir),
+               "--lease", str(lease_seconds), "--max-attempts", str(max_attempts)]
+        if shards:
+            cmd += ["--shard", str(n % shards)]
+        procs.append(subprocess.Popen(cmd))
+    return [p.wait() for p in procs]
+
+# =========================================================
+# MERGE
+# =========================================================
+
+def merge_results(out_dir, output):
+    """
+    Merge per-worker JSONL files into one, keeping the latest record per path
+    (an item can be processed twice if its lease expired mid-run).
+    """
+    latest = {}
+    for f in sorted(Path(out_dir).glob("results-*.jsonl")):
+        with open(f, encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partial line from a killed worker
+                prev = latest.get(rec["path"])
+                if prev is None or rec.get("finished_at", 0) >= prev.get("finished_at", 0):
+                    latest[rec["path"]] = rec
+    with open(output, "w", encoding="utf-8") as out:
+        for path in sorted(latest):
+            out.write(json.dumps(latest[path], ensure_ascii=False) + "\n")
+    return len(latest)
+
+# =========================================================
+# CLI
+# =========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded batch runner for saved listing files.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("init", help="create the queue from a manifest")
+    p.add_argument("db")
+    p.add_argument("manifest")
+    p.add_argument("--shards", type=int, default=1)
+
+    for name in ("worker", "run"):
+        p = sub.add_parser(name, help="run one worker" if name == "worker" else "run local worker processes")
+        p.add_argument("db")
+        p.add_argument("out_dir")
+        p.add_argument("--lease", type=float, default=300, help="lease timeout in seconds")
+        p.add_argument("--max-attempts", type=int, default=3)
+        if name == "worker":
+            p.add_argument("--shard", type=int, default=None, help="preferred shard")
+        else:
+            p.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+            p.add_argument("--shards", type=int, default=None, help="number of shards to spread workers over")
+
+    p = sub.add_parser("status", help="show item counts per status")
+    p.add_argument("db")
+
+    p = sub.add_parser("merge", help="merge per-worker results")
+    p.add_argument("out_dir")
+    p.add_argument("output")
+
+    args = parser.parse_args(argv)
+    if args.cmd == "init":
+        if args.shards < 1:
+            parser.error("--shards must be at least 1")
+        print(f"Added {init_queue(args.db, args.manifest, shards=args.shards)} items")
+    elif args.cmd == "worker":
+        n = run_worker(args.db, args.out_dir, shard=args.shard, lease_seconds=args.lease, max_attempts=args.max_attempts)
+        print(f"Worker finished {n} items")
+    elif args.cmd == "run":
+        codes = run_local(args.db, args.out_dir, workers=args.workers, shards=args.shards,
+                          lease_seconds=args.lease, max_attempts=args.max_attempts)
+        print(json.dumps(queue_status(args.db)))
+        return max(codes, default=0)
+    elif args.cmd == "status":
+        print(json.dumps(queue_status(args.db)))
+    elif args.cmd == "merge":
+        print(f"Merged {merge_results(args.out_dir, args.output)} records into {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark: import time and resident memory per entry point.
+
+Each target is imported in a fresh interpreter (so nothing is cached) and the
+median over --runs is reported. Use --json to append results for tracking.
+
+    python bench_startup.py
+    python bench_startup.py --runs 10 --json startup_history.jsonl
+"""
+
+import argparse, json, os, statistics, subprocess, sys, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# everything app.py used to import eagerly at module top
+_OLD_APP_IMPORTS = ["streamlit", "pandas", "pixelbin", "qrcode", "PIL.Image", "requests", "bs4"]
+
+# name -> statements to time
+TARGETS = {
+    "extractors": "import extractors",
+    "dedup": "import dedup",
+    "imaging": "import imaging",
+    # what every batch worker process pays before its first item
+    "batch_runner": "import batch_runner",
+    # the Streamlit script itself (bare mode: its warnings are silenced, not its imports)
+    "app": "import logging; logging.disable(logging.WARNING)\nimport app",
+    # baseline to compare "app" against; optional packages that are not installed are skipped
+    "full-stack": "\n".join(f"try:\n    import {m}\nexcept ImportError:\n    pass" for m in _OLD_APP_IMPORTS),
+}
+
+_PROBE = """
+import resource, sys, time
+t0 = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - t0
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ru_maxrss is KB on Linux, bytes on macOS
+rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+print()  # end any partial line the target printed
+print(f"{{elapsed}} {{rss_mb}}")
+"""
+
+def measure(stmt, runs=5):
+    """Return (median_import_seconds, median_peak_rss_mb), or None if the import fails."""
+    times, rss = [], []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(stmt=stmt)],
+            capture_output=True, text=True, cwd=HERE,
+        )
+        if proc.returncode != 0:
+            return None
+        # the target may print on its own; the probe's result is the last line
+        t, m = proc.stdout.strip().splitlines()[-1].split()
+        times.append(float(t))
+        rss.append(float(m))
+    return statistics.median(times), statistics.median(rss)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("targets", nargs="*", default=list(TARGETS), help="targets to measure")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="append results as one JSON line to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'target':<12} {'import (ms)':>12} {'peak RSS (MB)':>14}")
+    for name in args.targets:
+        res = measure(TARGETS.get(name, f"import {name}"), runs=args.runs)
+        if res is None:
+            print(f"{name:<12} {'import failed':>27}")
+            continue
+        secs, mb = res
+        results[name] = {"import_ms": round(secs * 1000, 1), "rss_mb": round(mb, 1)}
+        print(f"{name:<12} {secs * 1000:>12.1f} {mb:>14.1f}")
+
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps({"ts": int(time.time()), "python": sys.version.split()[0], "results": results}) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Cross-platform duplicate listing detection for extracted rows.
+
+Rows are the dicts returned by extract_bayut_fields / extract_propertyfinder_fields.
+Candidate pairs come from a lat/lon grid index (only neighbouring cells are compared,
+and within a cell only rows with the same bed count and a similar area), then each
+candidate is scored on distance, area, beds, price and title similarity.
+"""
+
+import math
+import re
+from collections import defaultdict
+
+import pandas as pd
+
+from normalize import normalize_rows, AREA_COL, BEDS_COL, PRICE_COL
+
+EARTH_RADIUS_M = 6371000.0
+
+# areas further apart than this (relative difference) are different units
+AREA_TOLERANCE = 0.10
+
+# max score for pairs without area or price on both sides: co-located rows with
+# only coordinates/beds (e.g. pinned to a building centre) must not match anything
+THIN_EVIDENCE_CAP = 0.5
+
+# score weights (sum to 1.0)
+WEIGHTS = {
+    "distance": 0.25,
+    "area": 0.25,
+    "beds": 0.15,
+    "price": 0.20,
+    "title": 0.15,
+}
+
+# =========================================================
+# VALUE PARSING
+# =========================================================
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def _to_coord(value):
+    """Signed decimal degrees from a Latitude/Longitude value, None if missing or invalid."""
+    try:
+        v = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) else None
+
+def _tokens(text):
+    return frozenset(_WORD_RE.findall((text or "").lower()))
+
+def _column(df, col):
+    """Typed column as a list with None for missing values."""
+    return [None if pd.isna(v) else v for v in df[col].tolist()]
+
+def _prepare(rows):
+    """
+    Extract the numeric/text features used for matching (None when missing).
+    Area, beds and price go through normalize.normalize_rows so both modules
+    share one set of parsing rules.
+    """
+    df = normalize_rows(rows)
+    area = _column(df, AREA_COL)
+    beds = _column(df, BEDS_COL)
+    price = _column(df, PRICE_COL)
+    return [
+        {
+            "lat": _to_coord(row.get("Latitude")),
+            "lon": _to_coord(row.get("Longitude")),
+            "area": None if area[i] is None else float(area[i]),
+            "beds": None if beds[i] is None else int(beds[i]),
+            "price": None if price[i] is None else float(price[i]),
+            "title": _tokens(row.get("Property Name*")),
+        }
+        for i, row in enumerate(rows)
+    ]
+
+# =========================================================
+# SPATIAL INDEX
+# =========================================================
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def _area_band(area):
+    """
+    Log-scale area bucket, one AREA_TOLERANCE wide: areas within tolerance of each
+    other fall in the same or adjacent bands. None when the area is missing.
+    """
+    if area is None or area <= 0:
+        return None
+    return math.floor(math.log(area) / -math.log(1.0 - AREA_TOLERANCE))
+
+def _compatible(key_a, key_b):
+    """Whether two (beds, area band) buckets can hold a matching pair (None matches all)."""
+    (beds_a, band_a), (beds_b, band_b) = key_a, key_b
+    if beds_a is not None and beds_b is not None and beds_a != beds_b:
+        return False
+    return band_a is None or band_b is None or abs(band_a - band_b) <= 1
+
+class GridIndex:
+    """
+    Fixed-size lat/lon grid. A cell is at least `radius_m` wide at every latitude up
+    to `ref_lat` (the largest |latitude| to be stored), so every point within radius_m
+    of a query lies in the query cell or one of its 8 neighbours.
+    Each cell is split into (beds, area band) buckets so rows pinned to one building
+    are only compared with rows that could still match.
+    """
+
+    def __init__(self, radius_m=150.0, ref_lat=25.2):
+        self.radius_m = radius_m
+        self.cell_lat = radius_m / 111320.0
+        # longitude degrees shrink with latitude; size cells for the highest latitude
+        self.cell_lon = radius_m / (111320.0 * max(math.cos(math.radians(abs(ref_lat))), 0.01))
+        self.cells = defaultdict(lambda: defaultdict(list))
+
+    def cell(self, lat, lon):
+        return (math.floor(lat / self.cell_lat), math.floor(lon / self.cell_lon))
+
+    def add(self, idx, lat, lon, key=(None, None)):
+        self.cells[self.cell(lat, lon)][key].append(idx)
+
+    def neighbours(self, lat, lon, key=(None, None)):
+        """Yield indices in compatible buckets of the 3x3 block of cells around (lat, lon)."""
+        cy, cx = self.cell(lat, lon)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                buckets = self.cells.get((cy + dy, cx + dx))
+                if not buckets:
+                    continue
+                for other, idxs in buckets.items():
+                    if _compatible(key, other):
+                        yield from idxs
+
+# =========================================================
+# SCORING
+# =========================================================
+
+def _ratio_score(a, b, tolerance):
+    """1.0 when equal, falling linearly to 0 at `tolerance` relative difference."""
+    if a is None or b is None or a <= 0 or b <= 0:
+        return None
+    diff = abs(a - b) / max(a, b)
+    return max(0.0, 1.0 - diff / tolerance)
+
+def score_pair(a, b, radius_m=150.0):
+    """
+    Score two prepared rows in [0, 1]. Missing features are left out and the
+    remaining weights are renormalised. Different bed counts and areas more than
+    AREA_TOLERANCE apart are a hard mismatch, and without area or price on both
+    sides the score is capped at THIN_EVIDENCE_CAP.
+    """
+    if a["beds"] is not None and b["beds"] is not None and a["beds"] != b["beds"]:
+        return 0.0
+
+    parts = {}
+    if None not in (a["lat"], a["lon"], b["lat"], b["lon"]):
+        dist = haversine_m(a["lat"], a["lon"], b["lat"], b["lon"])
+        if dist > radius_m:
+            return 0.0
+        parts["distance"] = 1.0 - dist / radius_m
+    parts["area"] = _ratio_score(a["area"], b["area"], tolerance=AREA_TOLERANCE)
+    if parts["area"] == 0.0:
+        return 0.0
+    parts["price"] = _ratio_score(a["price"], b["price"], tolerance=0.25)
+    if a["beds"] is not None and b["beds"] is not None:
+        parts["beds"] = 1.0
+    if a["title"] and b["title"]:
+        parts["title"] = len(a["title"] & b["title"]) / len(a["title"] | b["title"])
+
+    parts = {k: v for k, v in parts.items() if v is not None}
+    total_w = sum(WEIGHTS[k] for k in parts)
+    if not total_w:
+        return 0.0
+    score = sum(WEIGHTS[k] * v for k, v in parts.items()) / total_w
+    if "area" not in parts and "price" not in parts:
+        score = min(score, THIN_EVIDENCE_CAP)
+    return score
+
+# =========================================================
+# MATCHING
+# =========================================================
+
+def find_duplicate_pairs(rows, radius_m=150.0, min_score=0.75):
+    """
+    Return [(i, j, score), ...] for row pairs (i < j) that look like the same unit.
+    Rows without coordinates are skipped: they have no spatial candidates.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    prepared = _prepare(rows)
+    located = [i for i, p in enumerate(prepared) if p["lat"] is not None and p["lon"] is not None]
+    if not located:
+        return []
+
+    ref_lat = max(abs(prepared[i]["lat"]) for i in located)
+    index = GridIndex(radius_m=radius_m, ref_lat=ref_lat)
+    keys = {i: (prepared[i]["beds"], _area_band(prepared[i]["area"])) for i in located}
+    for i in located:
+        index.add(i, prepared[i]["lat"], prepared[i]["lon"], keys[i])
+
+    pairs = []
+    for i in located:
+        a = prepared[i]
+        for j in index.neighbours(a["lat"], a["lon"], keys[i]):
+            if j <= i:
+                continue
+            s = score_pair(a, prepared[j], radius_m=radius_m)
+            if s >= min_score:
+                pairs.append((i, j, round(s, 4)))
+    pairs.sort()
+    return pairs
+
+def group_duplicates(rows, radius_m=150.0, min_score=0.75):
+    """
+    Cluster rows into duplicate groups (union-find over matched pairs).
+    Returns a list of group ids, one per row; unmatched rows get their own id.
+    """
+    parent = list(range(len(rows)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in find_duplicate_pairs(rows, radius_m=radius_m, min_score=min_score):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return [find(i) for i in range(len(rows))]
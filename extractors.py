@@ -0,0 +1,521 @@
+"""
+Extraction core: HTML -> field dicts and gallery URL lists for Bayut and PropertyFinder.
+
+Only imports what parsing needs so batch jobs / worker processes can use it
+without pulling in Streamlit, PixelBin or Pillow.
+"""
+
+import re, json
+from urllib.parse import urlsplit, urlunsplit
+from bs4 import BeautifulSoup
+
+# =========================================================
+# COMMON HELPERS
+# =========================================================
+
+def strip_query(u: str) -> str:
+    p = urlsplit(u)
+    return urlunsplit((p.scheme, p.netloc, p.path, "", ""))
+
+def find_all_image_urls(raw_html: str):
+    """
+    Find common image URLs (jpg/jpeg/webp) in HTML text (very permissive).
+    """
+    pattern = re.compile(r'https?://[^\s"\'<>]+?\.(?:jpg|jpeg|webp)(?:\?[^\s"\'<>]*)?', re.IGNORECASE)
+    urls = pattern.findall(raw_html or "")
+    normalized, seen = [], set()
+    for u in urls:
+        clean = strip_query(u)
+        if clean not in seen:
+            seen.add(clean)
+            normalized.append(clean)
+    return normalized
+
+def _first(*vals):
+    """Return first non-empty string-like value."""
+    for v in vals:
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+    return ""
+
+def _jsonlds(soup: BeautifulSoup):
+    """Parse all application/ld+json blocks and return list of parsed objects."""
+    out = []
+    for s in soup.find_all("script", {"type": "application/ld+json"}):
+        try:
+            if not s.string:
+                continue
+            data = json.loads(s.string)
+            # some pages return a single dict or a list
+            if isinstance(data, list):
+                out.extend(data)
+            else:
+                out.append(data)
+        except Exception:
+            # try to recover some malformed JSON by stripping whitespace/newlines
+            try:
+                data = json.loads(s.string.strip())
+                if isinstance(data, list):
+                    out.extend(data)
+                else:
+                    out.append(data)
+            except Exception:
+                continue
+    return out
+
+def _get_residence(lds):
+    """Try to pick a residence-like JSON-LD entry (fallback to first dict)."""
+    if not lds:
+        return {}
+    for o in lds:
+        t = o.get("@type") if isinstance(o, dict) else None
+        if t and any(k in str(t).lower() for k in ("residence", "apartment", "house", "product", "offer")):
+            return o
+    # fallback: return first dict-like item
+    for o in lds:
+        if isinstance(o, dict):
+            return o
+    return {}
+
+# =========================================================
+# BAYUT SCRAPER (from file 2)
+# =========================================================
+
+def extract_bayut_fields(html: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+    lds  = _jsonlds(soup)
+    res  = _get_residence(lds)
+
+    row = {
+        "Property Name*": "",
+        # "Developer Name": "",
+        "Seller Name*": "",
+        "Property Type*": "",
+        "Description": "",
+        "Location": "",        
+        "Country*": "UAE",
+        "Bathrooms*": "",
+        "Bedrooms*": "",
+        "Google Map URL*": "",
+        "Latitude": "",
+        "Longitude": "",
+        "Property Area*": "",
+        "Plot Area (sq ft)": "",
+        "Total Floors": "",
+        "Instant Buy": "",
+        "Purchase Price*": "",
+        "Down-payment Type": "",
+        "Down-payment Value": "",
+        "Down-payment Price": "",
+        "Service Charge": "",
+        "Handover Date (Quarter)": "",
+        "Handover Date (Year)": "",
+        "Completion Status*": "",
+        "Furnishing Status*": "",
+        "Year Build": "",
+        "Reference Number": "",
+        
+        # Regulatory
+        "Permit Number": "",
+        "Trakheesi Permit Link": "",
+        "BRN": "",
+        "DED": "",
+        "RERA": "",
+        "Zone Name": "",
+        "Registered Agency": "",
+        "ARRA": "",
+
+    }
+
+    # Property Name
+    h1 = soup.find("h1")
+    if h1:
+        row["Property Name*"] = h1.get_text(strip=True)
+
+    # Description
+    desc_el = soup.select_one('[aria-label="Property description"]') \
+        or soup.find("div", {"data-testid": "listing-description"})
+    if desc_el:
+        row["Description"] = desc_el.get_text(" ", strip=True)
+
+    # Location
+    loc_el = soup.find("div", {"aria-label": "Property header"})
+    if loc_el:
+        row["Location"] = loc_el.get_text(" ", strip=True)
+
+    # Country from JSON-LD
+    if res and isinstance(res.get("address"), dict):
+        row["Country*"] = res["address"].get("addressCountry", "UAE")
+
+    # Beds / Baths / Area from JSON-LD (fallbacks)
+    if res:
+        row["Bedrooms*"] = str((res.get("numberOfRooms") or {}).get("value", "")) or row["Bedrooms*"]
+        row["Bathrooms*"] = str(res.get("numberOfBathroomsTotal", "")) or row["Bathrooms*"]
+        row["Property Area*"] = str((res.get("floorSize") or {}).get("value", "")) or row["Property Area*"]
+
+    # ---------- SPECIFIC MAPPING FOR Beds / Baths / Area (FROM THE ELEMENT YOU SHARED) ----------
+    def _grab_feature(label_regex: str) -> str:
+        el = soup.find("span", {"aria-label": re.compile(label_regex, re.I)})
+        if not el:
+            return ""
+        val_el = el.find("span", class_="_3458a9d4") or el
+        return val_el.get_text(" ", strip=True)
+
+    beds  = _grab_feature(r"^Beds$")
+    baths = _grab_feature(r"^Baths$")
+    area  = _grab_feature(r"^Area$")
+
+    if beds:  row["Bedrooms*"]      = beds        
+    if baths: row["Bathrooms*"]     = baths       
+    if area:  row["Property Area*"] = area        
+
+    for spec in soup.find_all("span", {"aria-label": True}):
+        label = spec["aria-label"].strip().lower()
+        inner_val = spec.find("span", class_="_3458a9d4")
+        value = (inner_val.get_text(" ", strip=True)
+                 if inner_val else spec.get_text(" ", strip=True))
+
+        if "reference" in label:
+            row["Reference Number"] = value
+        elif "total floors" in label:
+            row["Total Floors"] = value
+        elif "year of completion" in label:
+            row["Year Build"] = value
+        elif "handover date" in label:
+            val = value.upper()
+            if re.match(r"Q\d\s+\d{4}", val):
+                q, y = val.split()
+                row["Handover Date (Quarter)"] = q
+                row["Handover Date (Year)"] = y
+            elif re.match(r"\d{4}", val):
+                row["Handover Date (Year)"] = val
+
+    # Price
+    for o in lds:
+        if o.get("@type") == "ItemPage" and isinstance(o.get("mainEntity"), dict):
+            offers = o["mainEntity"].get("offers") or []
+            if isinstance(offers, list) and offers:
+                ps = offers[0].get("priceSpecification", {})
+                row["Purchase Price*"] = ps.get("price", "")
+
+    # Property Type
+    m = re.search(r'"property_type"\s*:\s*"([^"]+)"', html, re.I)
+    if m:
+        row["Property Type*"] = m.group(1).rstrip("s").title()
+
+    # Seller Name
+    for o in lds:
+        if o.get("@type") == "ItemPage":
+            me = o.get("mainEntity") or {}
+            off = (me.get("offers") or [{}])[0]
+            offeredBy = off.get("offeredBy") or {}
+            org = offeredBy.get("parentOrganization") or {}
+            row["Seller Name*"] = _first(org.get("name",""), offeredBy.get("name",""))
+
+    # Completion Status
+    m = re.search(r'"completion_status"\s*:\s*"([^"]+)"', html, re.I)
+    if m:
+        row["Completion Status*"] = m.group(1).replace("-", " ").title()
+
+    # Instant Buy rule
+    if row["Completion Status*"].lower() == "under construction":
+        row["Instant Buy"] = ""
+    else:
+        row["Instant Buy"] = "Yes"
+
+    # Furnishing Status
+    furnish_el = soup.find("li", {"aria-label": "Property furnishing status"})
+    if furnish_el:
+        val = furnish_el.get_text(" ", strip=True)
+        if "Furnish" in val:
+            val = val.split()[-1]
+        row["Furnishing Status*"] = val
+
+    # Regulatory info
+    for li in soup.select("ul._7d2126bd li"):
+        label_el = li.find("div", class_="_52bcc5bc")
+        value_el = li.find("span", class_="_677f9d24")
+        if not label_el or not value_el:
+            continue
+
+        label = label_el.get_text(strip=True).lower()
+        value = value_el.get_text(strip=True)
+
+        if "permit number" in label:
+            row["Permit Number"] = value
+        elif "zone name" in label:
+            row["Zone Name"] = value
+        elif "registered agency" in label:
+            row["Registered Agency"] = value
+        elif label == "ded":
+            row["DED"] = value
+        elif label == "rera":
+            row["RERA"] = value
+        elif label == "arra":
+            row["ARRA"] = value
+        elif label == "brn":
+            row["BRN"] = value
+
+    for a in soup.find_all("a", href=True):
+        text = a.get_text(" ", strip=True)
+        if re.search(r"Trakheesi Permit", text, re.I):
+            row["Trakheesi Permit Link"] = a["href"]
+            break
+
+    # Lat/Lon
+    if res and isinstance(res.get("geo"), dict):
+        row["Latitude"] = str(res["geo"].get("latitude",""))
+        row["Longitude"] = str(res["geo"].get("longitude",""))
+
+    if (not row["Latitude"] or not row["Longitude"]) and lds:
+        for obj in lds:
+            if isinstance(obj, dict) and isinstance(obj.get("geo"), dict):
+                row["Latitude"] = str(obj["geo"].get("latitude",""))
+                row["Longitude"] = str(obj["geo"].get("longitude",""))
+                break
+
+    # Google Maps URL
+    if row["Latitude"] and row["Longitude"]:
+        row["Google Map URL*"] = f"https://www.google.com/maps?q={row['Latitude']},{row['Longitude']}"
+
+    return row
+
+def filter_property_images(urls):
+    pattern = re.compile(r"-800x600\.webp$", re.I)
+    kept = []
+    for u in urls:
+        host = urlsplit(u).netloc.lower()
+        if "bayut" not in host:
+            continue
+        if pattern.search(u):
+            kept.append(u)
+    return kept
+
+def extract_gallery_images_bayut(raw_html: str):
+    all_urls = find_all_image_urls(raw_html)
+    return sorted(set(filter_property_images(all_urls)))
+
+# =========================================================
+# PROPERTYFINDER SCRAPER (from file 1)
+# =========================================================
+
+def extract_propertyfinder_fields(html: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+
+    row = {
+        "Property Name*": "",
+        "Seller Name*": "",
+        "Developer Name": "",
+        "Property Type*": "",
+        "Description": "",
+        "Location": "",        
+        "Country*": "UAE",
+        "Bathrooms*": "",
+        "Bedrooms*": "",
+        "Google Map URL*": "",
+        "Latitude": "",
+        "Longitude": "",
+        "Property Area*": "",
+        "Plot Area (sq ft)": "",
+        "Total Floors": "",
+        "Instant Buy": "",
+        "Purchase Price*": "",
+        "Down-payment Type": "",
+        "Down-payment Value": "",
+        "Down-payment Price": "",
+        "Service Charge": "",
+        "Handover Date (Quarter)": "",
+        "Handover Date (Year)": "",
+        "Completion Status*": "",
+        "Furnishing Status*": "",
+        "Year Build": "",
+        "Reference Number": "",
+        
+        # Regulatory
+        "Permit Number": "",
+        "Trakheesi Permit": "",
+        "BRN": "",
+        "DED": "",
+        "RERA": "",
+        "Zone Name": "",
+        "Registered Agency": "",
+        "ARRA": "",
+    }
+
+    # ---------------- PROPERTY NAME ----------------
+    desc_div = soup.find("div", id="description")
+    if desc_div:
+        h1 = desc_div.find("h1", class_="styles_desktop_title__j0uNx") or desc_div.find("h1")
+        if h1:
+            row["Property Name*"] = h1.get_text(strip=True)
+
+    # ---------------- SELLER NAME (Agent) ----------------
+    agent_el = soup.select_one('p[data-testid="property-detail-agent-name"]')
+    if agent_el:
+        row["Seller Name*"] = agent_el.get_text(strip=True)
+
+    # ---------------- DESCRIPTION ----------------
+    if desc_div:
+        article = desc_div.select_one('div[data-testid="description-section"] article[data-testid="dynamic-sanitize-html"]')
+        if article:
+            text = article.get_text("\n", strip=True)
+            lines = [line.strip() for line in text.splitlines()]
+            text_clean = "\n".join([ln for ln in lines if ln])
+            row["Description"] = text_clean
+
+    # ---------------- PROPERTY TYPE ----------------
+    type_el = soup.select_one('p[data-testid="property-details-type"]')
+    if type_el:
+        row["Property Type*"] = type_el.get_text(strip=True)
+
+    # ---------------- PROPERTY AREA ----------------
+    area_el = soup.select_one('p[data-testid="property-details-size"]')
+    if area_el:
+        row["Property Area*"] = area_el.get_text(strip=True)
+
+    # ---------------- BEDROOMS ----------------
+    bed_el = soup.select_one('p[data-testid="property-details-bedrooms"]')
+    if bed_el:
+        row["Bedrooms*"] = bed_el.get_text(strip=True)
+
+    # ---------------- BATHROOMS ----------------
+    bath_el = soup.select_one('p[data-testid="property-details-bathrooms"]')
+    if bath_el:
+        row["Bathrooms*"] = bath_el.get_text(strip=True)
+
+    # ---------------- PURCHASE PRICE ----------------
+    price_el = soup.select_one('span[data-testid="property-price-value"]')
+    if price_el:
+        row["Purchase Price*"] = "AED " + price_el.get_text(strip=True)
+
+    # ---------------- JSON-LD (LAT/LON + LOCATION) ----------------
+    script_tag = soup.find("script", {"id": "plp-schema", "type": "application/ld+json"})
+    if script_tag:
+        try:
+            data = json.loads(script_tag.string)
+            main_entity = data.get("mainEntity", {}).get("mainEntity", {})
+
+            # GEO
+            geo = main_entity.get("geo", {})
+            if geo:
+                row["Latitude"] = str(geo.get("latitude", ""))
+                row["Longitude"] = str(geo.get("longitude", ""))
+                if row["Latitude"] and row["Longitude"]:
+                    row["Google Map URL*"] = f"https://www.google.com/maps?q={row['Latitude']},{row['Longitude']}"
+
+            # LOCATION
+            address = main_entity.get("address", {})
+            if isinstance(address, dict):
+                row["Location"] = address.get("name", "")
+        except Exception as e:
+            print("Error parsing JSON-LD:", e)
+
+    # ---------------- REGULATORY INFO ----------------
+    regulatory_div = soup.find("div", class_="styles_desktop_content__Z_YaU")
+    if regulatory_div:
+        # Reference Number
+        ref_el = regulatory_div.select_one('p[data-testid="property-regulatory-reference"]')
+        if ref_el:
+            row["Reference Number"] = ref_el.get_text(strip=True)
+
+        # Collect all regulatory value <p>
+        license_texts = regulatory_div.find_all("p", class_="styles_desktop_value__mxst1")
+        for txt_el in license_texts:
+            txt = txt_el.get_text(strip=True)
+            if ("L.L.C" in txt or "LLC" in txt or "REAL ESTATE" in txt.upper()) and not row["Registered Agency"]:
+                row["Registered Agency"] = txt
+            elif txt.isdigit() and not row["DED"]:
+                row["DED"] = txt
+
+        # Permit Number
+        permit_el = regulatory_div.select_one('p[data-testid="property-regulatory-agent-license-no"]')
+        if permit_el:
+            row["Permit Number"] = permit_el.get_text(strip=True)
+
+        # BRN fallback
+        all_vals = [el.get_text(strip=True) for el in license_texts]
+        if all_vals:
+            for v in reversed(all_vals):
+                if v.isdigit():
+                    row["BRN"] = v
+                    break
+
+        # Zone Name
+        zone_label = regulatory_div.find(lambda tag: tag.name == "p" and "Zone name" in tag.get_text())
+        if zone_label:
+            next_val = zone_label.find_next_sibling("p", class_="styles_desktop_value__mxst1")
+            if next_val:
+                row["Zone Name"] = next_val.get_text(strip=True)
+
+    # ---------------- TRAKHEESI PERMIT (resolve redirect) ----------------
+    qr_div = soup.find("div", {"data-testid": "property-regulatory-qr-code"})
+    if qr_div:
+        link = qr_div.find("a", href=True)
+        if link:
+            raw_url = link["href"]
+            try:
+                import requests  # lazy: only needed when a QR link is present
+                response = requests.get(raw_url, allow_redirects=True, timeout=10)
+                row["Trakheesi Permit"] = response.url  
+            except Exception as e:
+                print("Error resolving Trakheesi link:", e)
+                row["Trakheesi Permit"] = raw_url  
+
+    # ---------------- DEVELOPER NAME ----------------
+    if row.get("Registered Agency"):
+        row["Developer Name"] = row.get("Registered Agency")
+    else:
+        broker_name_container = soup.find("div", class_="styles_desktop_broker__name__container__Rnz1J")
+        if broker_name_container:
+            link = broker_name_container.find("a", href=True)
+            if link:
+                href = link["href"]
+                m = re.search(r'/broker/([^/]+)', href)
+                if m:
+                    slug = m.group(1)
+                    slug = re.sub(r'-\d+$', '', slug)
+                    row["Developer Name"] = slug.replace('-', ' ').title()
+
+    return row
+
+def filter_propertyfinder_images(urls):
+    kept = []
+    pattern = re.compile(r"/(\d{2,4})/(\d{2,4})/MODE/", re.I)
+    for u in urls:
+        host = urlsplit(u).netloc.lower()
+        if "propertyfinder.ae" not in host:
+            continue
+        m = pattern.search(u)
+        if not m:
+            continue
+        try:
+            w, h = int(m.group(1)), int(m.group(2))
+        except Exception:
+            continue
+        if w >= 200 and h >= 200:
+            kept.append(u)
+    return kept
+
+def pick_highest_resolution(urls):
+    key_re = re.compile(r"(.*/\d+)/(\d+)/MODE/([^/]+)/([^/]+)\.(jpg|jpeg|webp)$", re.I)
+    buckets, leftovers = {}, []
+    for u in urls:
+        m = key_re.match(u)
+        if not m:
+            leftovers.append(u)
+            continue
+        key = m.group(4)
+        try:
+            w = int(m.group(2))
+            h = int(m.group(3)) if m.group(3).isdigit() else 0
+        except Exception:
+            w, h = 0, 0
+        area = w * h
+        best = buckets.get(key)
+        if not best or area > best[0]:
+            buckets[key] = (area, u)
+    best_urls = [t[1] for t in buckets.values()]
+    return sorted(set(best_urls + leftovers))
+
+def extract_gallery_images_propertyfinder(raw_html: str):
+    return pick_highest_resolution(filter_propertyfinder_images(find_all_image_urls(raw_html)))
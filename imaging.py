@@ -0,0 +1,105 @@
+"""
+Local re-encoding / resizing of cleaned images.
+
+PixelBin returns large lossless PNGs by default; this shrinks them to WebP/JPEG
+at a bounded size before they are shown, zipped or stored. Work runs in a process
+pool because Pillow encoding is CPU-bound.
+"""
+
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+PIL_FORMATS = {"webp": "WEBP", "jpg": "JPEG", "jpeg": "JPEG", "png": "PNG"}
+MIN_QUALITY = 30
+MIN_BUDGET_DIM = 320   # never downscale below this to meet a byte budget
+
+def process_pool(max_workers=None):
+    """
+    Process pool for re-encoding. Uses "spawn" because callers live inside the
+    multi-threaded Streamlit server, where fork()ed children can deadlock.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _encode(img, fmt, quality):
+    buf = io.BytesIO()
+    pil_fmt = PIL_FORMATS[fmt]
+    if pil_fmt == "JPEG":
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buf, format=pil_fmt, quality=quality, optimize=True, progressive=True)
+    elif pil_fmt == "WEBP":
+        img.save(buf, format=pil_fmt, quality=quality, method=4)
+    else:
+        img.save(buf, format=pil_fmt, optimize=True)
+    return buf.getvalue()
+
+def reencode_image(data, fmt="webp", quality=80, max_dim=1600, max_bytes=None):
+    """
+    Re-encode image bytes to `fmt`, downscaling so the longest side is <= max_dim.
+    With max_bytes set, quality is stepped down to MIN_QUALITY and then the image is
+    shrunk (not below MIN_BUDGET_DIM) until the result fits.
+    Returns the new bytes; the original bytes are returned if re-encoding made it bigger.
+    """
+    return _reencode(data, fmt, quality, max_dim, max_bytes)[0]
+
+def _reencode(data, fmt, quality, max_dim, max_bytes):
+    """reencode_image returning (bytes, budget_met)."""
+    fmt = fmt.lower()
+    if fmt not in PIL_FORMATS:
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    if max_dim and max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if img.mode == "P":
+        img = img.convert("RGBA")
+
+    out = _encode(img, fmt, quality)
+    if max_bytes and PIL_FORMATS[fmt] != "PNG":
+        q = quality
+        while len(out) > max_bytes and q > MIN_QUALITY:
+            q = max(MIN_QUALITY, q - 10)
+            out = _encode(img, fmt, q)
+        while len(out) > max_bytes and max(img.size) > MIN_BUDGET_DIM:
+            side = max(MIN_BUDGET_DIM, int(max(img.size) * 0.75))
+            img = img.copy()
+            img.thumbnail((side, side), Image.LANCZOS)
+            out = _encode(img, fmt, q)
+    if len(out) >= len(data):
+        out = data
+    return out, not max_bytes or len(out) <= max_bytes
+
+def make_thumbnail(data, max_dim=240, quality=70):
+    """Small JPEG preview of image bytes for grids (longest side <= max_dim)."""
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (max_dim, max_dim))  # cheap JPEG downscale on decode
+    img.thumbnail((max_dim, max_dim))
+    return _encode(img, "jpg", quality)
+
+def reencode_named(name, data, fmt="webp", quality=80, max_dim=1600, max_bytes=None):
+    """
+    reencode_image for a named file. Returns a dict with name (extension updated),
+    data, original_size, size, budget_met (False if max_bytes could not be reached)
+    and error; on failure the original bytes are passed through.
+    """
+    try:
+        out, budget_met = _reencode(data, fmt, quality, max_dim, max_bytes)
+        # keep the original extension if re-encoding did not pay off
+        new_name = (os.path.splitext(name)[0] + "." + fmt) if out is not data else name
+        return {"name": new_name, "data": out, "original_size": len(data), "size": len(out),
+                "budget_met": budget_met, "error": None}
+    except Exception as e:
+        return {"name": name, "data": data, "original_size": len(data), "size": len(data),
+                "budget_met": not max_bytes or len(data) <= max_bytes, "error": str(e)}
+
+def format_bytes(n):
+    """Human readable byte count, e.g. '12.3 MB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
@@ -0,0 +1,122 @@
+"""
+Batch normalization of extracted rows into typed numeric columns.
+
+Works on whole columns with pandas string/numeric ops (no per-row Python), so it
+can run over large exports. Unparseable values become NA and are flagged in a
+"<column> invalid" boolean column instead of raising.
+"""
+
+import numpy as np
+import pandas as pd
+
+SQM_TO_SQFT = 10.7639
+MAX_PRICE = 10**12   # AED; anything larger is a parsing artefact (and would overflow Int64)
+
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+_SCALE = {
+    "": 1,
+    "K": 1_000,
+    "M": 1_000_000, "MN": 1_000_000, "MILLION": 1_000_000,
+    "B": 1_000_000_000, "BN": 1_000_000_000, "BILLION": 1_000_000_000,
+}
+# whole value must be [AED] number [scale] [AED]; anything else is invalid
+_PRICE_RE = r"^(?:AED)?\s*" + _NUM + r"\s*(MILLION|MN|M|BILLION|BN|B|K)?\s*(?:AED)?$"
+# unit right after the number decides: "1,313 sqft / 122 sqm" is sq ft.
+# A bare number is sq ft; a number followed by any other text ("2 acres") is invalid.
+_AREA_RE = r"^" + _NUM + r"\s*(?:(SQ\.?\s*FT|SQFT|FT²|FT2|SQ\.?\s*M|SQM|M²|M2)(?![A-Z]).*)?$"
+
+# typed output columns
+PRICE_COL = "Price (AED)"
+AREA_COL = "Area (sq ft)"
+BEDS_COL = "Bedrooms"
+BATHS_COL = "Bathrooms"
+HANDOVER_COL = "Handover Date"
+
+def _text(df, col):
+    """Column as stripped strings ('' for missing), whether or not it exists."""
+    if col not in df:
+        return pd.Series("", index=df.index, dtype="object")
+    return df[col].fillna("").astype(str).str.strip()
+
+def _number(s):
+    """First number in each string ('1,234.5 sqft' -> 1234.5), NaN when absent."""
+    return pd.to_numeric(s.str.extract(_NUM, expand=False).str.replace(",", "", regex=False), errors="coerce")
+
+def _invalid(raw, parsed):
+    """Raw value was present but did not parse."""
+    return (raw.ne("") & parsed.isna()).astype(bool)
+
+def normalize_price(raw):
+    """'AED 1,900,000' / '1900000' / '1.9M' / 'AED 1.5 Million' -> Int64 AED."""
+    parts = raw.str.upper().str.strip().str.extract(_PRICE_RE)
+    value = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce")
+    scale = parts[1].fillna("").map(_SCALE).astype(float)
+    total = value * scale
+    return total.where(total <= MAX_PRICE).round().astype("Int64")
+
+def normalize_area(raw):
+    """
+    '1,234 sqft' / '115 sqm' / '1,313 sqft / 122 sqm' / '1234' -> float sq ft.
+    The unit next to the first number decides; sq ft is assumed only for a bare
+    number, unknown units ('2 acres', '1,234 sq yd') give NaN.
+    """
+    parts = raw.str.upper().str.strip().str.extract(_AREA_RE)
+    value = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce")
+    is_sqm = parts[1].fillna("").str.contains("M", regex=False)
+    return value.where(~is_sqm, value * SQM_TO_SQFT).astype(float)
+
+def normalize_count(raw):
+    """'2' / '7+' / 'Studio' -> Int64 (Studio is 0 bedrooms)."""
+    value = _number(raw)
+    value = value.mask(raw.str.contains("studio", case=False, regex=False), 0)
+    return value.round().astype("Int64")
+
+def normalize_handover(quarter, year):
+    """
+    Quarter ('Q3') + year ('2026') -> datetime of the quarter start.
+    Year-only values map to January 1st; the quarter may also sit in the year text.
+    An out-of-range quarter ('Q5') gives NaT rather than a guessed date.
+    """
+    both = quarter.str.cat(year, sep=" ").str.upper()
+    y = pd.to_numeric(both.str.extract(r"\b((?:19|20)\d{2})\b", expand=False), errors="coerce")
+    q = pd.to_numeric(both.str.extract(r"\bQ(\d+)\b", expand=False), errors="coerce")
+    y = y.where(q.isna() | q.between(1, 4))
+    q = q.fillna(1)
+    month = (q - 1) * 3 + 1
+    parts = pd.DataFrame({"year": y, "month": month, "day": 1}).where(y.notna())
+    return pd.to_datetime(parts, errors="coerce")
+
+def normalize_rows(rows):
+    """
+    Add typed columns to a batch of extracted rows (list of dicts or DataFrame).
+    Returns a new DataFrame with the original columns plus:
+    Price (AED), Area (sq ft), Bedrooms, Bathrooms, Handover Date
+    and a "<column> invalid" flag for each of them.
+    """
+    df = pd.DataFrame(rows) if not isinstance(rows, pd.DataFrame) else rows.copy()
+
+    price_raw = _text(df, "Purchase Price*")
+    area_raw = _text(df, "Property Area*")
+    beds_raw = _text(df, "Bedrooms*")
+    baths_raw = _text(df, "Bathrooms*")
+    quarter_raw = _text(df, "Handover Date (Quarter)")
+    year_raw = _text(df, "Handover Date (Year)")
+
+    df[PRICE_COL] = normalize_price(price_raw)
+    df[AREA_COL] = normalize_area(area_raw)
+    df[BEDS_COL] = normalize_count(beds_raw)
+    df[BATHS_COL] = normalize_count(baths_raw)
+    df[HANDOVER_COL] = normalize_handover(quarter_raw, year_raw)
+
+    df[f"{PRICE_COL} invalid"] = _invalid(price_raw, df[PRICE_COL])
+    df[f"{AREA_COL} invalid"] = _invalid(area_raw, df[AREA_COL])
+    df[f"{BEDS_COL} invalid"] = _invalid(beds_raw, df[BEDS_COL])
+    df[f"{BATHS_COL} invalid"] = _invalid(baths_raw, df[BATHS_COL])
+    df[f"{HANDOVER_COL} invalid"] = _invalid(quarter_raw.str.cat(year_raw).str.strip(), df[HANDOVER_COL])
+
+    # non-positive prices/areas are extraction garbage, not real values
+    for col in (PRICE_COL, AREA_COL):
+        bad = (df[col].notna() & (df[col] <= 0)).fillna(False).astype(bool)
+        df.loc[bad, col] = np.nan if col == AREA_COL else pd.NA
+        df[f"{col} invalid"] = df[f"{col} invalid"] | bad
+    return df
@@ -0,0 +1,97 @@
+import json
+import sqlite3
+
+import pytest
+
+import batch_runner as br
+
+LISTING = (
+    '<html><h1>Listing {n}</h1>'
+    '<script type="application/ld+json">{{"@type": "Residence", "geo": {{"latitude": 25.{n}, "longitude": 55.1}}}}</script>'
+    ' https://images.bayut.com/thumbnails/{n}-800x600.webp</html>'
+)
+
+@pytest.fixture
+def queue(tmp_path):
+    """Queue with 6 saved Bayut listings over 2 shards; returns (db, out_dir, paths)."""
+    paths = []
+    for n in range(1, 7):
+        p = tmp_path / f"{n}.html"
+        p.write_text(LISTING.format(n=n), encoding="utf-8")
+        paths.append(str(p))
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("\n".join(paths) + "\n", encoding="utf-8")
+    db = str(tmp_path / "queue.db")
+    assert br.init_queue(db, manifest, shards=2) == 6
+    return db, tmp_path / "out", paths
+
+def _items(db):
+    conn = sqlite3.connect(db)
+    try:
+        return {path: (status, attempts) for path, status, attempts in
+                conn.execute("SELECT path, status, attempts FROM items")}
+    finally:
+        conn.close()
+
+def test_two_workers_claim_reclaim_and_merge(queue, tmp_path):
+    db, out_dir, paths = queue
+    # a worker that claims one item and dies
+    conn = br.connect(db)
+    _, dead_path, _ = br.claim(conn, "dead", lease_seconds=0.5)
+    conn.close()
+
+    codes = br.run_local(db, out_dir, workers=2, shards=2, lease_seconds=1)
+    assert codes == [0, 0]
+    assert br.queue_status(db) == {"done": 6}
+    assert _items(db)[dead_path] == ("done", 2)
+
+    merged = tmp_path / "merged.jsonl"
+    assert br.merge_results(out_dir, merged) == 6
+    records = [json.loads(line) for line in merged.read_text(encoding="utf-8").splitlines()]
+    assert sorted(r["path"] for r in records) == sorted(paths)
+    assert {r["fields"]["Property Name*"] for r in records} == {f"Listing {n}" for n in range(1, 7)}
+
+def test_expired_final_attempt_is_marked_failed(queue):
+    db, out_dir, _ = queue
+    conn = br.connect(db)
+    _, dead_path, _ = br.claim(conn, "dead", lease_seconds=1, max_attempts=1)
+    conn.close()
+
+    # the live worker must wait the lease out instead of exiting with it still leased
+    assert br.run_worker(db, out_dir, lease_seconds=1, max_attempts=1, worker="live") == 5
+    assert _items(db)[dead_path] == ("failed", 1)
+
+def test_failing_item_is_retried_then_failed(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text(f"bayut\t{tmp_path / 'missing.html'}\n", encoding="utf-8")
+    db = str(tmp_path / "queue.db")
+    br.init_queue(db, manifest)
+    assert br.run_worker(db, tmp_path / "out", max_attempts=2, worker="w") == 0
+    assert list(_items(db).values()) == [("failed", 2)]
+
+def test_relative_manifest_paths_use_manifest_dir(tmp_path, monkeypatch):
+    (tmp_path / "listings").mkdir()
+    (tmp_path / "listings" / "1.html").write_text(LISTING.format(n=1), encoding="utf-8")
+    manifest = tmp_path / "listings" / "manifest.txt"
+    manifest.write_text("bayut\t1.html\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)   # not the manifest's directory
+    db = str(tmp_path / "queue.db")
+    assert br.init_queue(db, manifest) == 1
+    assert list(_items(db)) == [str((tmp_path / "listings" / "1.html").resolve())]
+
+def test_init_rejects_zero_shards(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("1.html\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        br.init_queue(str(tmp_path / "queue.db"), manifest, shards=0)
+
+def test_merge_keeps_latest_record_per_path(tmp_path):
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    (out_dir / "results-a.jsonl").write_text(
+        json.dumps({"path": "/x", "worker": "a", "finished_at": 1}) + "\n" + '{"path": "/y", "wor', encoding="utf-8")
+    (out_dir / "results-b.jsonl").write_text(
+        json.dumps({"path": "/x", "worker": "b", "finished_at": 2}) + "\n", encoding="utf-8")
+    merged = tmp_path / "merged.jsonl"
+    assert br.merge_results(out_dir, merged) == 1
+    assert json.loads(merged.read_text(encoding="utf-8"))["worker"] == "b"
@@ -0,0 +1,80 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from dedup import find_duplicate_pairs, group_duplicates, score_pair, _prepare, THIN_EVIDENCE_CAP
+
+BAYUT = {
+    "Property Name*": "Luxury 2BR in Dubai Hills",
+    "Latitude": "25.1000", "Longitude": "55.2000",
+    "Property Area*": "1234", "Bedrooms*": "2", "Purchase Price*": "1900000",
+}
+PF = {
+    "Property Name*": "2BR Dubai Hills | Luxury",
+    "Latitude": "25.1003", "Longitude": "55.2001",
+    "Property Area*": "1,234 sqft / 115 sqm", "Bedrooms*": "2", "Purchase Price*": "AED 1,900,000",
+}
+
+def _score(a, b):
+    pa, pb = _prepare([a, b])
+    return score_pair(pa, pb)
+
+def test_same_unit_across_platforms_matches():
+    assert find_duplicate_pairs([BAYUT, PF]) == [(0, 1, pytest.approx(_score(BAYUT, PF), abs=1e-4))]
+    assert _score(BAYUT, PF) > 0.9
+
+@pytest.mark.parametrize("change", [
+    {"Bedrooms*": "3"},                                    # different beds: hard mismatch
+    {"Latitude": "25.2000"},                               # ~11 km away
+    {"Property Area*": "2,400 sqft"},
+    {"Purchase Price*": "AED 5,000,000"},
+])
+def test_different_units_do_not_match(change):
+    assert find_duplicate_pairs([BAYUT, {**PF, **change}]) == []
+
+def test_thin_evidence_is_capped():
+    # only coordinates + beds: typical building-centre pin
+    bare = {"Latitude": "25.1000", "Longitude": "55.2000", "Bedrooms*": "2"}
+    assert _score(bare, BAYUT) <= THIN_EVIDENCE_CAP
+    assert _score(bare, dict(bare)) <= THIN_EVIDENCE_CAP
+
+def test_thin_row_does_not_chain_different_units():
+    cheap = {**BAYUT, "Purchase Price*": "900000", "Property Area*": "700"}
+    pricey = {**BAYUT, "Purchase Price*": "5000000", "Property Area*": "2500"}
+    bare = {"Latitude": "25.1000", "Longitude": "55.2000", "Bedrooms*": "2"}
+    assert group_duplicates([cheap, bare, pricey]) == [0, 1, 2]
+
+def test_opposite_hemispheres_do_not_match():
+    north = {**BAYUT, "Latitude": "33.86", "Longitude": "151.2"}
+    south = {**BAYUT, "Latitude": "-33.86", "Longitude": "151.2"}
+    assert find_duplicate_pairs([north, south]) == []
+
+@pytest.mark.parametrize("lat", ["", None, "n/a"])
+def test_rows_without_coordinates_are_skipped(lat):
+    assert find_duplicate_pairs([{**BAYUT, "Latitude": lat}, PF]) == []
+
+def test_high_latitude_neighbours_are_found():
+    # cells sized for the batch mean (Dubai) would be too narrow at 60N
+    dubai = [{**BAYUT, "Bedrooms*": "1"}] * 20
+    lon_step = 122 / (111320 * math.cos(math.radians(60)))
+    for k in range(50):
+        lon = 10 + k * 0.00037
+        a = {**BAYUT, "Latitude": "60.0", "Longitude": str(lon)}
+        b = {**a, "Longitude": str(lon + lon_step)}
+        assert (20, 21) in [p[:2] for p in find_duplicate_pairs(dubai + [a, b])]
+
+def test_building_centre_pins_match_brute_force():
+    rng = random.Random(7)
+    rows = [{
+        "Latitude": "25.1", "Longitude": "55.2",
+        "Bedrooms*": rng.choice(["1", "2", "3", "", "Studio"]),
+        "Property Area*": rng.choice(["", str(rng.randint(500, 2000))]),
+        "Purchase Price*": str(rng.randint(8, 30) * 100000),
+        "Property Name*": "Tower unit",
+    } for _ in range(150)]
+    prepared = _prepare(rows)
+    expected = [(i, j) for i, j in itertools.combinations(range(len(rows)), 2)
+                if score_pair(prepared[i], prepared[j]) >= 0.75]
+    assert [p[:2] for p in find_duplicate_pairs(rows)] == expected
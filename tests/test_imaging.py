@@ -0,0 +1,69 @@
+import io
+
+import pytest
+from PIL import Image
+
+from imaging import (
+    reencode_image, reencode_named, make_thumbnail, format_bytes, MIN_BUDGET_DIM,
+)
+
+def _png(size=(1200, 900), noise=True):
+    img = Image.effect_noise(size, 80).convert("RGB") if noise else Image.new("RGB", size, (40, 90, 160))
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+def _size(data):
+    return Image.open(io.BytesIO(data)).size
+
+def test_downscales_to_max_dim():
+    out = reencode_image(_png(), fmt="webp", max_dim=600)
+    assert max(_size(out)) == 600
+    assert Image.open(io.BytesIO(out)).format == "WEBP"
+
+def test_budget_met_by_lowering_quality():
+    data = _png()
+    loose = reencode_image(data, fmt="jpg", quality=95, max_dim=1200)
+    budget = len(loose) // 2
+    r = reencode_named("cleaned_1.png", data, fmt="jpg", quality=95, max_dim=1200, max_bytes=budget)
+    assert r["budget_met"] and r["size"] <= budget
+    assert _size(r["data"]) == (1200, 900)   # quality alone was enough
+
+def test_budget_shrinks_after_quality_floor():
+    r = reencode_named("cleaned_1.png", _png(), fmt="webp", max_dim=1200, max_bytes=20_000)
+    assert r["budget_met"] and r["size"] <= 20_000
+    assert MIN_BUDGET_DIM <= max(_size(r["data"])) < 1200
+
+def test_budget_not_met_stops_at_min_dim():
+    r = reencode_named("cleaned_1.png", _png(), fmt="webp", max_dim=1200, max_bytes=100)
+    assert not r["budget_met"]
+    assert r["error"] is None
+    assert max(_size(r["data"])) == MIN_BUDGET_DIM
+
+def test_extension_follows_format():
+    r = reencode_named("cleaned_3.png", _png(), fmt="webp")
+    assert r["name"] == "cleaned_3.webp"
+    assert r["size"] < r["original_size"]
+
+def test_original_kept_when_reencoding_is_bigger():
+    small = _png((16, 16), noise=False)   # a few dozen bytes; any JPEG header is bigger
+    r = reencode_named("cleaned_2.png", small, fmt="jpg")
+    assert r["data"] is small and r["name"] == "cleaned_2.png"
+    assert r["size"] == r["original_size"]
+
+def test_failure_passes_original_through():
+    r = reencode_named("cleaned_4.png", b"not an image", fmt="webp", max_bytes=5)
+    assert r["error"]
+    assert r["data"] == b"not an image" and r["name"] == "cleaned_4.png"
+    assert not r["budget_met"]
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        reencode_image(_png((32, 32)), fmt="gif")
+
+def test_thumbnail():
+    assert max(_size(make_thumbnail(_png()))) == 240
+
+@pytest.mark.parametrize("n, text", [(512, "512 B"), (2048, "2.0 KB"), (5 * 1024 ** 2, "5.0 MB")])
+def test_format_bytes(n, text):
+    assert format_bytes(n) == text
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from normalize import (
+    normalize_rows, PRICE_COL, AREA_COL, BEDS_COL, BATHS_COL, HANDOVER_COL,
+)
+
+def _one(**row):
+    return normalize_rows([row]).iloc[0]
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1900000", 1900000),            # Bayut JSON-LD price
+    (1900000, 1900000),
+    (1900000.0, 1900000),
+    ("AED 1,900,000", 1900000),      # PropertyFinder price text
+    ("1,900,000 AED", 1900000),
+    ("1.9M", 1900000),
+    ("AED 1.5 Million", 1500000),
+    ("2.25 Mn", 2250000),
+    ("850K", 850000),
+])
+def test_price(raw, expected):
+    row = _one(**{"Purchase Price*": raw})
+    assert row[PRICE_COL] == expected
+    assert not row[f"{PRICE_COL} invalid"]
+
+@pytest.mark.parametrize("raw", [
+    "Price on request", "AED 1.5 Mio", "0", "AED -",
+    "99999999999999999999999", "9999999999 BN",     # beyond MAX_PRICE / Int64 range
+])
+def test_price_invalid(raw):
+    row = _one(**{"Purchase Price*": raw})
+    assert pd.isna(row[PRICE_COL])
+    assert row[f"{PRICE_COL} invalid"]
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1234", 1234.0),                     # Bayut JSON-LD floorSize
+    ("1,234 sqft", 1234.0),               # Bayut feature span
+    ("1,313 sqft / 122 sqm", 1313.0),     # PropertyFinder size text
+    ("122 sqm / 1,313 sqft", 122 * 10.7639),
+    ("115 sq. m", 115 * 10.7639),
+    ("980 sq ft", 980.0),
+])
+def test_area(raw, expected):
+    row = _one(**{"Property Area*": raw})
+    assert row[AREA_COL] == pytest.approx(expected)
+    assert not row[f"{AREA_COL} invalid"]
+
+@pytest.mark.parametrize("raw", ["2 acres", "1,234 sq yd", "115 sq mi", "n/a"])
+def test_area_unknown_unit_is_invalid(raw):
+    row = _one(**{"Property Area*": raw})
+    assert pd.isna(row[AREA_COL])
+    assert row[f"{AREA_COL} invalid"]
+
+@pytest.mark.parametrize("raw, expected", [("2", 2), ("Studio", 0), ("studio", 0), ("7+", 7)])
+def test_beds(raw, expected):
+    assert _one(**{"Bedrooms*": raw})[BEDS_COL] == expected
+
+def test_handover_split_quarter_and_year():
+    row = _one(**{"Handover Date (Quarter)": "Q3", "Handover Date (Year)": "2026"})
+    assert row[HANDOVER_COL] == pd.Timestamp("2026-07-01")
+    row = _one(**{"Handover Date (Year)": "2027"})
+    assert row[HANDOVER_COL] == pd.Timestamp("2027-01-01")
+
+def test_handover_bad_quarter_is_invalid():
+    row = _one(**{"Handover Date (Quarter)": "Q5", "Handover Date (Year)": "2026"})
+    assert pd.isna(row[HANDOVER_COL])
+    assert row[f"{HANDOVER_COL} invalid"]
+
+def test_bad_row_does_not_abort_batch():
+    df = normalize_rows([{"Purchase Price*": "99999999999999999999999"}, {"Purchase Price*": "AED 1,900,000"}])
+    assert df[PRICE_COL].tolist()[1] == 1900000
+
+def test_missing_values_are_not_invalid():
+    row = _one()
+    for col in (PRICE_COL, AREA_COL, BEDS_COL, BATHS_COL, HANDOVER_COL):
+        assert pd.isna(row[col])
+        assert not row[f"{col} invalid"]
+
+def test_invalid_flags_are_plain_bool():
+    df = normalize_rows([{"Purchase Price*": "0", "Property Area*": "abc"}, {}])
+    for col in (PRICE_COL, AREA_COL, BEDS_COL, BATHS_COL, HANDOVER_COL):
+        assert df[f"{col} invalid"].dtype == bool
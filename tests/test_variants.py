@@ -0,0 +1,25 @@
+import pytest
+
+import variants
+from variants import VariantCache, resolve_variant
+
+BAYUT = "https://images.bayut.com/thumbnails/123-800x600.webp"
+
+@pytest.fixture
+def cache(tmp_path):
+    return VariantCache(str(tmp_path / "variants.sqlite"))
+
+def test_processing_picks_largest_verified_variant(cache, monkeypatch):
+    monkeypatch.setattr(variants, "probe", lambda url: "1066x800" in url)
+    assert resolve_variant(BAYUT, "processing", cache) == BAYUT.replace("800x600", "1066x800")
+    assert resolve_variant(BAYUT, "archival", cache) == BAYUT.replace("800x600", "1066x800")
+
+def test_thumbnail_falls_back_to_scraped_url(cache, monkeypatch):
+    monkeypatch.setattr(variants, "probe", lambda url: False)
+    assert resolve_variant(BAYUT, "thumbnail", cache) == BAYUT
+
+@pytest.mark.parametrize("answer, cached", [(True, True), (False, False), (None, None)])
+def test_only_definite_answers_are_cached(cache, monkeypatch, answer, cached):
+    monkeypatch.setattr(variants, "probe", lambda url: answer)
+    resolve_variant(BAYUT, "processing", cache)
+    assert cache.get(BAYUT.replace("800x600", "1066x800")) is cached
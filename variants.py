@@ -0,0 +1,171 @@
+"""
+Resolution-aware gallery variant selection.
+
+Both CDNs serve the same photo at several sizes, encoded in the URL:
+  Bayut:          .../thumbnails/<id>-<W>x<H>.<ext>
+  PropertyFinder: .../<W>/<H>/MODE/<mode>/<name>.<ext>
+For an image this enumerates candidate sizes, probes them (HEAD) in preference
+order for a use case and caches which variants exist in a small SQLite file,
+so later sessions/workers skip the network round trips.
+
+Use cases:
+  thumbnail  - smallest variant at least THUMBNAIL_MIN_WIDTH wide (UI previews)
+  processing - largest variant whose longest side is <= PROCESSING_MAX_DIM (PixelBin input)
+  archival   - largest variant available
+"""
+
+import os, re, sqlite3, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+THUMBNAIL_MIN_WIDTH = 120
+PROCESSING_MAX_DIM = 1600
+NEGATIVE_TTL = 7 * 24 * 3600   # re-probe missing variants after a week
+
+# candidate sizes (W, H); only verified ones are ever returned
+BAYUT_SIZES = [(120, 90), (240, 180), (400, 300), (800, 600), (1066, 800), (1920, 1440)]
+PROPERTYFINDER_SIZES = [(156, 104), (416, 272), (668, 452), (856, 520), (1312, 894), (1920, 1080)]
+
+USES = ("thumbnail", "processing", "archival")
+
+_BAYUT_RE = re.compile(r"^(?P<base>https?://[^/]*bayut[^/]*/.+?)-(?P<w>\d{2,4})x(?P<h>\d{2,4})\.(?P<ext>jpe?g|webp)$", re.I)
+_PF_RE = re.compile(r"^(?P<base>https?://[^/]*propertyfinder[^/]*/.+?)/(?P<w>\d{2,4})/(?P<h>\d{2,4})/(?P<rest>MODE/[^/]+/[^/]+)\.(?P<ext>jpe?g|webp)$", re.I)
+
+def _default_cache_path():
+    root = os.environ.get("SCRAPERMAPPER_CACHE_DIR") or os.path.join(Path.home(), ".cache", "scrapermapper")
+    return os.path.join(root, "variants.sqlite")
+
+# =========================================================
+# ENUMERATION
+# =========================================================
+
+def enumerate_variants(url):
+    """
+    Return [(width, height, url), ...] for the known sizes of this image, including
+    the given URL itself. Unknown URL shapes return just [(0, 0, url)].
+    """
+    m = _BAYUT_RE.match(url)
+    if m:
+        make = lambda w, h: f"{m['base']}-{w}x{h}.{m['ext']}"
+        sizes = BAYUT_SIZES
+    else:
+        m = _PF_RE.match(url)
+        if not m:
+            return [(0, 0, url)]
+        make = lambda w, h: f"{m['base']}/{w}/{h}/{m['rest']}.{m['ext']}"
+        sizes = PROPERTYFINDER_SIZES
+    own = (int(m["w"]), int(m["h"]))
+    out = {(w, h): make(w, h) for w, h in sizes}
+    out[own] = url
+    return [(w, h, u) for (w, h), u in sorted(out.items())]
+
+def _preference(variants, use):
+    """Candidates for a use case, best first."""
+    if use == "thumbnail":
+        ok = [v for v in variants if v[0] >= THUMBNAIL_MIN_WIDTH]
+        return sorted(ok, key=lambda v: v[0] * v[1]) + sorted(set(variants) - set(ok), key=lambda v: -v[0] * v[1])
+    if use == "processing":
+        ok = [v for v in variants if max(v[0], v[1]) <= PROCESSING_MAX_DIM]
+        return sorted(ok, key=lambda v: -v[0] * v[1]) + sorted(set(variants) - set(ok), key=lambda v: v[0] * v[1])
+    if use == "archival":
+        return sorted(variants, key=lambda v: -v[0] * v[1])
+    raise ValueError(f"Unknown use case {use!r}; expected one of {USES}")
+
+# =========================================================
+# PROBE CACHE
+# =========================================================
+
+class VariantCache:
+    """Persistent url -> exists map (SQLite, safe to share between processes)."""
+
+    def __init__(self, path=None):
+        self.path = path or _default_cache_path()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS probes (url TEXT PRIMARY KEY, ok INTEGER NOT NULL, checked_at REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, url):
+        """True / False if known (negatives expire after NEGATIVE_TTL), else None."""
+        row = self._conn().execute("SELECT ok, checked_at FROM probes WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        ok, checked_at = row
+        if not ok and time.time() - checked_at > NEGATIVE_TTL:
+            return None
+        return bool(ok)
+
+    def set(self, url, ok):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO probes VALUES (?, ?, ?)", (url, int(ok), time.time()))
+
+def probe(url, timeout=10):
+    """
+    Return True if the CDN serves an image at url, False if it definitely does not
+    (404/410, or a 200 that is not an image) and None when the answer is unknown
+    (transport errors, 5xx, 429, ...). Unknown answers must not be cached.
+    """
+    import requests
+    try:
+        r = requests.head(url, allow_redirects=True, timeout=timeout)
+        if r.status_code in (403, 405):
+            # some CDNs reject HEAD; fall back to a streamed GET without reading the body
+            r = requests.get(url, stream=True, timeout=timeout)
+            r.close()
+    except requests.RequestException:
+        return None
+    if r.status_code in (404, 410):
+        return False
+    if r.status_code == 200:
+        return r.headers.get("Content-Type", "").startswith("image/")
+    return None
+
+_default_cache = None
+
+def _get_cache(cache):
+    global _default_cache
+    if cache is not None:
+        return cache
+    if _default_cache is None:
+        _default_cache = VariantCache()
+    return _default_cache
+
+# =========================================================
+# RESOLUTION
+# =========================================================
+
+def resolve_variant(url, use="processing", cache=None):
+    """
+    Pick the best verified variant of url for a use case. Candidates are probed
+    in preference order and probing stops at the first hit. The input URL was
+    scraped from the page, so it counts as verified and is the final fallback.
+    Candidates whose probe is inconclusive are skipped for now but not cached.
+    """
+    cache = _get_cache(cache)
+    for w, h, candidate in _preference(enumerate_variants(url), use):
+        if candidate == url:
+            return url
+        known = cache.get(candidate)
+        if known is None:
+            known = probe(candidate)
+            if known is not None:
+                cache.set(candidate, known)
+        if known:
+            return candidate
+    return url
+
+def resolve_gallery(urls, use="processing", cache=None, max_workers=8):
+    """resolve_variant for a whole gallery (probes run in a thread pool, order kept)."""
+    urls = list(urls)
+    if not urls:
+        return []
+    cache = _get_cache(cache)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        return list(pool.map(lambda u: resolve_variant(u, use, cache), urls))